@@ -1,14 +1,25 @@
 from __future__ import annotations
 
 import asyncio
+import hashlib
 import json
 import logging
+import os
 import re
+import secrets
+from collections import deque
+from functools import lru_cache
+from itertools import islice
 from pathlib import Path
 from typing import Optional
 
 from fastmcp import FastMCP
 
+try:
+    import orjson
+except ImportError:  # 可选加速依赖，未安装时回退到标准库 json
+    orjson = None
+
 from .services.pipeline import Pipeline
 from .services.reverse_analyzer import ReverseAnalyzer
 
@@ -18,10 +29,70 @@ BASE_DIR = Path(__file__).resolve().parent.parent.parent
 CONFIG_PATH = BASE_DIR / ".mcp_config" / "config.json"
 
 
+@lru_cache(maxsize=1)
+def _parse_config(mtime: float) -> dict:
+    # mtime 作为缓存键：配置文件未变化时复用上一次的解析结果。
+    return _json_loads(CONFIG_PATH.read_bytes())
+
+
+def _json_loads(data: str | bytes) -> object:
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+EXECUTE_JS_MAX_DEPTH = 5
+EXECUTE_JS_MAX_ITEMS = 200
+EXECUTE_JS_MAX_STRING_CHARS = 2000
+
+
+def _truncate_for_display(value: object, depth: int = EXECUTE_JS_MAX_DEPTH) -> object:
+    """按深度、容器元素数、字符串长度裁剪返回值，限制序列化与输出的规模。"""
+    if isinstance(value, str):
+        if len(value) > EXECUTE_JS_MAX_STRING_CHARS:
+            return value[:EXECUTE_JS_MAX_STRING_CHARS] + f"…(共 {len(value)} 字符)"
+        return value
+    if isinstance(value, dict):
+        if depth <= 0:
+            return f"…({len(value)} 个字段)" if value else {}
+        truncated = {}
+        for i, (key, item) in enumerate(value.items()):
+            if i >= EXECUTE_JS_MAX_ITEMS:
+                truncated["…"] = f"省略 {len(value) - EXECUTE_JS_MAX_ITEMS} 个字段"
+                break
+            truncated[key] = _truncate_for_display(item, depth - 1)
+        return truncated
+    if isinstance(value, list):
+        if depth <= 0:
+            return f"…({len(value)} 项)" if value else []
+        truncated_list = [
+            _truncate_for_display(item, depth - 1)
+            for item in value[:EXECUTE_JS_MAX_ITEMS]
+        ]
+        if len(value) > EXECUTE_JS_MAX_ITEMS:
+            truncated_list.append(f"…省略 {len(value) - EXECUTE_JS_MAX_ITEMS} 项")
+        return truncated_list
+    return value
+
+
+def _json_dumps_pretty(value: object) -> str:
+    if orjson is not None:
+        try:
+            return orjson.dumps(
+                value, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS
+            ).decode("utf-8")
+        except orjson.JSONEncodeError:
+            # 超出 64 位的整数等 orjson 不支持的值交给标准库处理。
+            pass
+    return json.dumps(value, ensure_ascii=False, indent=2)
+
+
 def _load_config() -> dict:
-    if CONFIG_PATH.exists():
-        return json.loads(CONFIG_PATH.read_text(encoding="utf-8"))
-    return {}
+    try:
+        mtime = CONFIG_PATH.stat().st_mtime
+    except FileNotFoundError:
+        return {}
+    return _parse_config(mtime)
 
 
 config = _load_config()
@@ -29,80 +100,153 @@ pipeline = Pipeline(config=config, base_dir=BASE_DIR)
 
 mcp = FastMCP(name="auto_js_reverse")
 
-INTERESTING_REQUEST_HEADERS = (
-    "authorization",
-    "cookie",
-    "x-token",
-    "x-sign",
-    "x-signature",
-    "x-timestamp",
-    "x-nonce",
-    "content-type",
-    "referer",
-    "origin",
+INTERESTING_REQUEST_HEADERS: frozenset[str] = frozenset(
+    {
+        "authorization",
+        "cookie",
+        "x-token",
+        "x-sign",
+        "x-signature",
+        "x-timestamp",
+        "x-nonce",
+        "content-type",
+        "referer",
+        "origin",
+    }
 )
 REQUEST_PARAM_PATTERN = re.compile(
     r"(?i)\b(sign|signature|token|access_token|refresh_token|nonce|timestamp|password|pwd|encrypt)\b"
 )
 
 
-def _build_hook_js(function_path: str, max_calls: int) -> str:
-    safe_path = function_path.replace("'", "\\'")
-    return (
-        """
+# 每次 Hook 捕获使用独立的 binding 名与页面内注册项，并发捕获互不覆盖上报通道。
+HOOK_BINDING_PREFIX = "__insightReport_"
+HOOK_VALUE_PREVIEW_CHARS = 500
+HOOK_VALUE_PREVIEW_DEPTH = 3
+HOOK_VALUE_PREVIEW_ITEMS = 20
+HOOK_VALUE_PREVIEW_NODES = 200
+
+_HOOK_JS_TEMPLATE = """
     (function() {
-        var _hookedCalls = [];
-        var _maxCalls = """
-        + str(max_calls)
-        + """;
+        var _reported = 0;
+        var _maxCalls = %(max_calls)d;
+        var _previewChars = %(preview_chars)d;
+        var _previewDepth = %(preview_depth)d;
+        var _previewItems = %(preview_items)d;
+        var _previewNodes = %(preview_nodes)d;
+        var _bindingName = %(binding_literal)s;
+        var _report = window[_bindingName];
+        var _active = true;
+        var _path = %(path_literal)s;
         var _target;
-        try { _target = """
-        + function_path
-        + """; } catch(e) {
-            return JSON.stringify({error: '"""
-        + safe_path
-        + """ 不存在: ' + e.message});
+        if (typeof _report !== 'function') {
+            return JSON.stringify({error: 'Hook 上报通道未注册'});
+        }
+        try { _target = %(expression)s; } catch(e) {
+            return JSON.stringify({error: _path + ' 不存在: ' + e.message});
         }
         if (typeof _target !== 'function') {
-            return JSON.stringify({error: '"""
-        + safe_path
-        + """ 不是函数'});
+            return JSON.stringify({error: _path + ' 不是函数'});
         }
         var _original = _target;
-        var _parts = '"""
-        + safe_path
-        + """'.split('.');
+        var _parts = _path.split('.');
         var _parent = _parts.length > 1
             ? _parts.slice(0, -1).reduce(function(o, k) { return o[k]; }, window)
             : window;
         var _key = _parts[_parts.length - 1];
 
-        _parent[_key] = function() {
-            var args = Array.prototype.slice.call(arguments);
+        // 预览在被 Hook 函数的调用路径上同步执行，按深度/条目数/节点数截断，避免序列化大对象拖慢页面。
+        function _preview(v) {
+            var depths = new WeakMap();
+            var nodes = 0;
+            function _bounded(k, val) {
+                var depth = (this && typeof this === 'object' && depths.has(this)) ? depths.get(this) + 1 : 0;
+                if (++nodes > _previewNodes) { return undefined; }
+                if (typeof val === 'string') {
+                    return val.length > _previewChars ? val.substring(0, _previewChars) : val;
+                }
+                if (val === null || typeof val !== 'object') { return val; }
+                if (depth >= _previewDepth) {
+                    return Array.isArray(val) ? '[Array(' + val.length + ')]' : '[Object]';
+                }
+                if (Array.isArray(val)) {
+                    if (val.length > _previewItems) { val = val.slice(0, _previewItems); }
+                } else {
+                    var keys = Object.keys(val);
+                    if (keys.length > _previewItems) {
+                        var head = {};
+                        for (var i = 0; i < _previewItems; i++) { head[keys[i]] = val[keys[i]]; }
+                        val = head;
+                    }
+                }
+                depths.set(val, depth);
+                return val;
+            }
+            try {
+                var text = JSON.stringify(v, _bounded);
+                return text === undefined ? String(v) : text.substring(0, _previewChars);
+            }
+            catch(e) { return String(v).substring(0, _previewChars); }
+        }
+
+        var _wrapper = function() {
+            if (!_active || _reported >= _maxCalls) {
+                return _original.apply(this, arguments);
+            }
+            _reported++;
             var callInfo = {
-                args: args.map(function(a) {
-                    try { return JSON.stringify(a).substring(0, 500); }
-                    catch(e) { return String(a).substring(0, 500); }
-                }),
+                args: Array.prototype.map.call(arguments, _preview),
                 stack: new Error().stack.split('\\n').slice(1, 6).map(function(s) { return s.trim(); }),
             };
             var result = _original.apply(this, arguments);
-            try { callInfo.returnValue = JSON.stringify(result).substring(0, 500); }
-            catch(e) { callInfo.returnValue = String(result).substring(0, 500); }
-            if (_hookedCalls.length < _maxCalls) _hookedCalls.push(callInfo);
+            callInfo.returnValue = _preview(result);
+            // 每次调用通过 CDP binding 立即推送给 Python，不在页面内缓存。
+            _report(JSON.stringify(callInfo));
             return result;
         };
-
-        window.__browserInsightHook = {
-            calls: _hookedCalls,
-            restore: function() { _parent[_key] = _original; },
+        _parent[_key] = _wrapper;
+
+        var _hooks = window.__browserInsightHook = window.__browserInsightHook || {};
+        _hooks[_bindingName] = {
+            restore: function() {
+                // 之后又有其他 Hook 包裹了同一函数时不能直接还原，只停用本层上报。
+                _active = false;
+                if (_parent[_key] === _wrapper) { _parent[_key] = _original; }
+                delete _hooks[_bindingName];
+            },
         };
-        return JSON.stringify({status: 'hooked', target: '"""
-        + safe_path
-        + """'});
+        return JSON.stringify({status: 'hooked', target: _path});
     })()
     """
+
+
+_HOOK_RESTORE_JS_TEMPLATE = """
+    (function(hook) { if (hook) { hook.restore(); } })(
+        window.__browserInsightHook && window.__browserInsightHook[%s]
     )
+    """
+
+
+def _new_hook_binding_name() -> str:
+    return HOOK_BINDING_PREFIX + secrets.token_hex(4)
+
+
+def _build_hook_js(function_path: str, max_calls: int, binding_name: str) -> str:
+    # function_path 既作为表达式求值，也以 JSON 字符串字面量的形式参与拼接和报错信息。
+    return _HOOK_JS_TEMPLATE % {
+        "max_calls": max_calls,
+        "preview_chars": HOOK_VALUE_PREVIEW_CHARS,
+        "preview_depth": HOOK_VALUE_PREVIEW_DEPTH,
+        "preview_items": HOOK_VALUE_PREVIEW_ITEMS,
+        "preview_nodes": HOOK_VALUE_PREVIEW_NODES,
+        "binding_literal": json.dumps(binding_name),
+        "path_literal": json.dumps(function_path),
+        "expression": function_path,
+    }
+
+
+def _build_hook_restore_js(binding_name: str) -> str:
+    return _HOOK_RESTORE_JS_TEMPLATE % json.dumps(binding_name)
 
 
 async def _run_hook_capture(
@@ -112,38 +256,57 @@ async def _run_hook_capture(
     max_calls: int,
     duration: float,
 ) -> dict:
+    calls: list[dict] = []
+
+    def _on_report(payload: str) -> None:
+        if len(calls) >= max_calls:
+            return
+        try:
+            calls.append(_json_loads(payload))
+        except ValueError:
+            logger.debug("忽略无法解析的 Hook 上报: %.200s", payload)
+
+    browser = pipeline._browser
+    binding_name = _new_hook_binding_name()
     try:
-        await pipeline._browser.ensure_connected(target_url=target_url)
-        hook_result = await pipeline._browser.evaluate(
-            _build_hook_js(function_path=function_path, max_calls=max_calls)
-        )
+        await browser.ensure_connected(target_url=target_url)
+        await browser.add_binding(binding_name, _on_report)
     except Exception as e:
         return {"status": "error", "message": f"❌ Hook 失败: {e}"}
 
-    parsed = json.loads(hook_result) if isinstance(hook_result, str) else hook_result
-    if isinstance(parsed, dict) and parsed.get("error"):
-        return {"status": "error", "message": f"❌ {parsed['error']}"}
-
-    if trigger_action:
+    try:
         try:
-            await pipeline._browser.evaluate(trigger_action)
+            hook_result = await browser.evaluate(
+                _build_hook_js(
+                    function_path=function_path,
+                    max_calls=max_calls,
+                    binding_name=binding_name,
+                )
+            )
         except Exception as e:
-            logger.warning("trigger_action 执行失败: %s", e)
+            return {"status": "error", "message": f"❌ Hook 失败: {e}"}
 
-    await asyncio.sleep(max(duration, 0.0))
+        parsed = _json_loads(hook_result) if isinstance(hook_result, str) else hook_result
+        if isinstance(parsed, dict) and parsed.get("error"):
+            return {"status": "error", "message": f"❌ {parsed['error']}"}
 
-    try:
-        calls_raw = await pipeline._browser.evaluate(
-            "JSON.stringify(window.__browserInsightHook ? window.__browserInsightHook.calls : [])"
-        )
-        await pipeline._browser.evaluate(
-            "window.__browserInsightHook && window.__browserInsightHook.restore()"
-        )
-    except Exception as e:
-        return {"status": "error", "message": f"❌ 获取 Hook 结果失败: {e}"}
+        if trigger_action:
+            try:
+                await browser.evaluate(trigger_action)
+            except Exception as e:
+                logger.warning("trigger_action 执行失败: %s", e)
+
+        await asyncio.sleep(max(duration, 0.0))
 
-    calls = json.loads(calls_raw) if isinstance(calls_raw, str) else calls_raw
-    return {"status": "ok", "calls": calls or []}
+        try:
+            # restore 的响应晚于之前所有 bindingCalled 事件到达，此后 calls 已完整。
+            await browser.evaluate(_build_hook_restore_js(binding_name))
+        except Exception as e:
+            return {"status": "error", "message": f"❌ 获取 Hook 结果失败: {e}"}
+    finally:
+        await browser.remove_binding(binding_name)
+
+    return {"status": "ok", "calls": calls}
 
 
 def _format_hook_output(function_path: str, calls: list[dict], duration: float) -> str:
@@ -212,8 +375,11 @@ async def _capture_network_events(
             except Exception:
                 pass
 
-    asyncio.create_task(_trigger())
-    events = await pipeline._browser.collect_network_events(duration_sec=duration)
+    # 监听协程排在前面先启动，trigger 在 0.3s 后触发；gather 同时保证 trigger 被等待完成。
+    events, _ = await asyncio.gather(
+        pipeline._browser.collect_network_events(duration_sec=duration),
+        _trigger(),
+    )
     if filter_type:
         events = [e for e in events if e.get("type", "").lower() == filter_type.lower()]
     return events
@@ -482,6 +648,11 @@ async def capture_current_page(
     return "，".join(parts) + "。"
 
 
+def _result_dedup_key(text: str) -> bytes:
+    # 按前 200 字符去重，集合中只保存 8 字节摘要而非字符串前缀。
+    return hashlib.blake2b(text[:200].encode("utf-8"), digest_size=8).digest()
+
+
 @mcp.tool
 async def search_local_codebase(
     query: str, domain_filter: Optional[str] = None, limit: int = 10
@@ -505,31 +676,42 @@ async def search_local_codebase(
     if not results:
         return "未找到相关代码。请先使用 capture_current_page 抓取页面。"
 
-    seen_texts: set[str] = set()
-    unique_results = []
+    seen_keys: set[bytes] = set()
+    output_parts = []
     for r in results:
-        text_key = r.get("text", "")[:200]
-        if text_key not in seen_texts:
-            seen_texts.add(text_key)
-            unique_results.append(r)
+        text = r.get("text", "")
+        text_key = _result_dedup_key(text)
+        if text_key in seen_keys:
+            continue
+        seen_keys.add(text_key)
 
-    output_parts = []
-    for i, r in enumerate(unique_results, 1):
         source_tag = (
             "🔄 Source Map 还原" if r.get("source_map_restored") else "📦 混淆代码"
         )
-        header = (
-            f"### 结果 {i} [{source_tag}]\n"
+        output_parts.append(
+            f"### 结果 {len(output_parts) + 1} [{source_tag}]\n"
             f"- 文件: `{r.get('original_file', 'unknown')}`\n"
             f"- 来源: `{r.get('url', '')}`\n"
             f"- 行号: {r.get('line_start', '?')}-{r.get('line_end', '?')}\n"
+            f"```javascript\n{text}\n```"
         )
-        code = f"```javascript\n{r.get('text', '')}\n```"
-        output_parts.append(header + code)
 
     return "\n\n".join(output_parts)
 
 
+def _get_file_sizes(local_paths: list[str]) -> list[Optional[int]]:
+    sizes: list[Optional[int]] = []
+    for local_path in local_paths:
+        if not local_path:
+            sizes.append(None)
+            continue
+        try:
+            sizes.append(os.stat(local_path).st_size)
+        except OSError:
+            sizes.append(None)
+    return sizes
+
+
 @mcp.tool
 async def list_captured_files(domain_filter: Optional[str] = None) -> str:
     """列出本地已抓取归档的所有 JS 文件。
@@ -544,21 +726,56 @@ async def list_captured_files(domain_filter: Optional[str] = None) -> str:
         hint = f" (域名: {domain_filter})" if domain_filter else ""
         return f"暂无已抓取的文件{hint}。请先使用 capture_current_page 抓取页面。"
 
+    # 单次线程切换内逐个 os.stat，避免每个文件一次 to_thread 调度和两次 Path 系统调用。
+    file_sizes = await asyncio.to_thread(
+        _get_file_sizes, [f.get("local_path", "") for f in files]
+    )
+
     lines = [f"📁 已抓取文件列表 (共 {len(files)} 个)\n"]
-    for f in files:
-        sm = "✅ 有 Source Map" if f.get("source_map_restored") else "❌ 无 Source Map"
+    for f, file_size in zip(files, file_sizes):
+        url = f.get("url", "")
         local = f.get("local_path", "")
-        size = ""
-        if local and Path(local).exists():
-            size = f" ({Path(local).stat().st_size:,} bytes)"
+        domain = f.get("domain", "")
+        timestamp = f.get("timestamp", "")
+        sm = "✅ 有 Source Map" if f.get("source_map_restored") else "❌ 无 Source Map"
+        size = f" ({file_size:,} bytes)" if file_size is not None else ""
         lines.append(
-            f"- `{f.get('url', '')}`\n"
+            f"- `{url}`\n"
             f"  本地: `{local}`{size}\n"
-            f"  {sm} | 域名: {f.get('domain', '')} | 时间: {f.get('timestamp', '')}"
+            f"  {sm} | 域名: {domain} | 时间: {timestamp}"
         )
     return "\n".join(lines)
 
 
+def _last_item(iterable, default):
+    # 用 maxlen=1 的 deque 在 C 层耗尽迭代器，只保留最后一项。
+    tail = deque(iterable, maxlen=1)
+    return tail[0] if tail else default
+
+
+def _read_line_range(
+    path: Path, start_line: int, end_line: Optional[int]
+) -> tuple[list[str], int]:
+    """逐行读取文件，只保留 [start_line, end_line] 区间，同时统计总行数。
+
+    行数语义与按换行符整体切分一致：以换行结尾的文件，末尾计为一个空行。
+    """
+    selected: list[str] = []
+    window = None if end_line is None else end_line - start_line + 1
+    with path.open("r", encoding="utf-8", errors="replace") as f:
+        numbered = enumerate(f, 1)
+        total, last_line = _last_item(islice(numbered, start_line - 1), (0, "\n"))
+        for total, last_line in islice(numbered, window):
+            selected.append(last_line[:-1] if last_line.endswith("\n") else last_line)
+        total, last_line = _last_item(numbered, (total, last_line))
+
+    if last_line.endswith("\n"):
+        total += 1
+        if total >= start_line and (end_line is None or total <= end_line):
+            selected.append("")
+    return selected, total
+
+
 @mcp.tool
 async def read_js_file(
     file_path: Optional[str] = None,
@@ -614,22 +831,21 @@ async def read_js_file(
         return f"❌ 文件不存在: {target_path}"
 
     try:
-        content = target_path.read_text(encoding="utf-8", errors="replace")
+        selected, total = await asyncio.to_thread(
+            _read_line_range, target_path, start_line, end_line
+        )
     except Exception as e:
         return f"❌ 读取失败: {e}"
 
-    all_lines = content.split("\n")
-    total = len(all_lines)
     if start_line > total:
         return f"❌ start_line 超出文件总行数 ({total})。"
 
     start = start_line - 1
     end = min(total, end_line) if end_line is not None else total
-    selected = all_lines[start:end]
 
     header = f"📄 `{target_path.name}` (行 {start + 1}-{end}/{total})\n"
     numbered = "\n".join(
-        f"{start + 1 + i:>6} | {line}" for i, line in enumerate(selected)
+        [f"{lineno:>6} | {line}" for lineno, line in enumerate(selected, start + 1)]
     )
     return header + f"```javascript\n{numbered}\n```"
 
@@ -658,7 +874,7 @@ async def execute_js(expression: str, target_url: Optional[str] = None) -> str:
         return f"```\n{result}\n```"
 
     try:
-        formatted = json.dumps(result, ensure_ascii=False, indent=2)
+        formatted = _json_dumps_pretty(_truncate_for_display(result))
         return f"```json\n{formatted}\n```"
     except (TypeError, ValueError):
         return f"```\n{result}\n```"
@@ -699,26 +915,29 @@ async def capture_network_requests(
 
     lines = [f"🌐 捕获到 {len(events)} 个网络请求 ({duration}s)\n"]
     for i, evt in enumerate(events, 1):
-        resp = evt.get("response") or {}
-        status = resp.get("status", "-")
-        lines.append(
+        method = evt.get("method", "?")
+        url = evt.get("url", "")
+        req_type = evt.get("type", "?")
+        initiator = evt.get("initiator", "?")
+        status = (evt.get("response") or {}).get("status", "-")
+        post = evt.get("postData")
+        interesting = _extract_interesting_headers(evt.get("headers", {}))
+
+        entry = (
             f"### 请求 {i}\n"
-            f"- **{evt.get('method', '?')}** `{evt.get('url', '')}`\n"
-            f"- 类型: {evt.get('type', '?')} | 状态: {status}\n"
-            f"- 发起方: {evt.get('initiator', '?')}"
+            f"- **{method}** `{url}`\n"
+            f"- 类型: {req_type} | 状态: {status}\n"
+            f"- 发起方: {initiator}"
         )
-        if evt.get("postData"):
-            post = evt["postData"]
+        if post:
             if len(post) > 2000:
                 post = post[:2000] + "...(截断)"
-            lines.append(f"- POST 数据:\n```\n{post}\n```")
-
-        req_headers = evt.get("headers", {})
-        interesting = _extract_interesting_headers(req_headers)
+            entry += f"\n- POST 数据:\n```\n{post}\n```"
         if interesting:
-            lines.append("- 关键请求头:")
-            for k, v in interesting.items():
-                lines.append(f"  - `{k}`: `{v}`")
+            entry += "\n- 关键请求头:" + "".join(
+                f"\n  - `{k}`: `{v}`" for k, v in interesting.items()
+            )
+        lines.append(entry)
 
     return "\n".join(lines)
 
@@ -761,7 +980,7 @@ async def hook_function(
     )
 
 
-ENCRYPTION_PATTERNS = {
+_ENCRYPTION_PATTERN_SOURCES = {
     "MD5": r"(?i)\b(md5|MD5|hex_md5)\s*\(",
     "SHA": r"(?i)\b(sha1|sha256|sha512|SHA)\s*\(",
     "AES": r"(?i)\b(AES|aes)\s*\.\s*(encrypt|decrypt|Encrypt|Decrypt)",
@@ -774,6 +993,44 @@ ENCRYPTION_PATTERNS = {
     "sign/signature": r"(?i)\b(sign|signature|getSign|makeSign|calcSign)\s*\(",
     "token/encrypt": r"(?i)\b(encrypt|decrypt|encode|decode|encryptData|decryptData)\s*\(",
 }
+ENCRYPTION_PATTERNS: dict[str, re.Pattern[str]] = {
+    name: re.compile(pattern) for name, pattern in _ENCRYPTION_PATTERN_SOURCES.items()
+}
+ENCRYPTION_MATCH_LIMIT = 20
+
+
+def _scoped_pattern(pattern: str) -> str:
+    # 拼接成交替分支时，开头的全局 (?i) 需要改写为分支内的局部标志。
+    if pattern.startswith("(?i)"):
+        return f"(?i:{pattern[4:]})"
+    return f"(?:{pattern})"
+
+
+# 单次预筛：任一加密特征命中才会进入逐模式分类，绝大多数无关代码块只扫描一遍。
+_COMBINED_ENCRYPTION_PATTERN = re.compile(
+    "|".join(_scoped_pattern(pattern) for pattern in _ENCRYPTION_PATTERN_SOURCES.values())
+)
+
+
+def _scan_encryption_matches(domain_filter: Optional[str]) -> dict[str, list[dict]]:
+    all_matches: dict[str, list[dict]] = {}
+    full = 0
+    for chunk in pipeline.index.iter_chunks(domain=domain_filter):
+        text = chunk.get("text") or ""
+        if not _COMBINED_ENCRYPTION_PATTERN.search(text):
+            continue
+        for name, compiled in ENCRYPTION_PATTERNS.items():
+            # 已满的模式不再匹配；所有模式都满后提前结束扫描。
+            if len(all_matches.get(name, ())) >= ENCRYPTION_MATCH_LIMIT:
+                continue
+            if compiled.search(text):
+                bucket = all_matches.setdefault(name, [])
+                bucket.append(chunk)
+                if len(bucket) == ENCRYPTION_MATCH_LIMIT:
+                    full += 1
+        if full == len(ENCRYPTION_PATTERNS):
+            break
+    return all_matches
 
 
 @mcp.tool
@@ -785,21 +1042,7 @@ async def analyze_encryption(domain_filter: Optional[str] = None) -> str:
     Args:
         domain_filter: 限制扫描的域名，例如 "www.example.com"
     """
-    all_matches: dict[str, list[dict]] = {}
-
-    for name, pattern in ENCRYPTION_PATTERNS.items():
-        matches = pipeline.index.search_chunks_by_text(
-            pattern, domain=domain_filter, limit=20
-        )
-        if matches:
-            filtered = []
-            for m in matches:
-                text = m.get("text", "")
-                found = re.findall(pattern, text)
-                if found:
-                    filtered.append(m)
-            if filtered:
-                all_matches[name] = filtered
+    all_matches = await asyncio.to_thread(_scan_encryption_matches, domain_filter)
 
     if not all_matches:
         return (
@@ -814,12 +1057,14 @@ async def analyze_encryption(domain_filter: Optional[str] = None) -> str:
     for name, matches in all_matches.items():
         lines.append(f"## {name} ({len(matches)} 处)")
         for m in matches[:5]:
+            original_file = m.get("original_file", "?")
+            line_start = m.get("line_start", "?")
+            line_end = m.get("line_end", "?")
             text = m.get("text", "")
             if len(text) > 500:
                 text = text[:500] + "..."
             lines.append(
-                f"- 文件: `{m.get('original_file', '?')}` "
-                f"(行 {m.get('line_start', '?')}-{m.get('line_end', '?')})\n"
+                f"- 文件: `{original_file}` (行 {line_start}-{line_end})\n"
                 f"```javascript\n{text}\n```"
             )
         if len(matches) > 5:
@@ -1159,11 +1404,21 @@ def list_archived_sites() -> str:
     return "\n".join(lines)
 
 
+def _install_uvloop() -> None:
+    try:
+        import uvloop
+    except ImportError:  # 可选加速依赖；Windows 上不可用，保持默认事件循环
+        return
+    asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+    logger.info("已启用 uvloop 事件循环")
+
+
 def main() -> None:
     logging.basicConfig(
         level=logging.INFO,
         format="%(asctime)s [%(name)s] %(levelname)s: %(message)s",
     )
+    _install_uvloop()
     mcp.run()
 
 
@@ -1,7 +1,7 @@
 /**
  * auto_js_reverse Node.js Worker - JS 解析与 Source Map 还原
  *
- * 通信协议: stdin/stdout JSON 行协议
+ * 通信协议: stdin/stdout 长度前缀帧（4 字节大端正文长度 + UTF-8 JSON 正文）
  * 输入: { "command": "parse", "files": [...] }
  * 输出: { "status": "success"|"error", "results": [...] }
  *
@@ -323,34 +323,60 @@ async function handleCommand(input) {
     return { status: 'error', message: `Unknown command: ${input.command}` };
 }
 
-let buffer = '';
+const HEADER_SIZE = 4;
 
-process.stdin.setEncoding('utf-8');
-process.stdin.on('data', async (chunk) => {
-    buffer += chunk;
-    const lines = buffer.split('\n');
-    buffer = lines.pop() || '';
+// 收到的数据块先暂存，凑够一帧时才合并，避免大载荷每来一块就整体拷贝一次。
+let chunks = [];
+let buffered = 0;
+let expected = -1; // 当前帧正文长度，-1 表示尚未读到帧头
+let queue = Promise.resolve();
 
-    for (const line of lines) {
-        const trimmed = line.trim();
-        if (!trimmed) continue;
+function take(size) {
+    const all = chunks.length === 1 ? chunks[0] : Buffer.concat(chunks, buffered);
+    const rest = all.subarray(size);
+    chunks = rest.length ? [rest] : [];
+    buffered = rest.length;
+    return all.subarray(0, size);
+}
 
-        let input;
-        try {
-            input = JSON.parse(trimmed);
-        } catch {
-            const errResp = { status: 'error', message: 'Invalid JSON input' };
-            process.stdout.write(JSON.stringify(errResp) + '\n');
-            continue;
-        }
+function writeFrame(obj) {
+    const body = Buffer.from(JSON.stringify(obj), 'utf-8');
+    const header = Buffer.allocUnsafe(HEADER_SIZE);
+    header.writeUInt32BE(body.length, 0);
+    process.stdout.write(header);
+    process.stdout.write(body);
+}
 
-        try {
-            const result = await handleCommand(input);
-            process.stdout.write(JSON.stringify(result) + '\n');
-        } catch (err) {
-            const errResp = { status: 'error', message: err.message };
-            process.stdout.write(JSON.stringify(errResp) + '\n');
+async function handleFrame(body) {
+    let input;
+    try {
+        input = JSON.parse(body.toString('utf-8'));
+    } catch {
+        writeFrame({ status: 'error', message: 'Invalid JSON input' });
+        return;
+    }
+
+    try {
+        writeFrame(await handleCommand(input));
+    } catch (err) {
+        writeFrame({ status: 'error', message: err.message });
+    }
+}
+
+process.stdin.on('data', (chunk) => {
+    chunks.push(chunk);
+    buffered += chunk.length;
+
+    for (;;) {
+        if (expected < 0) {
+            if (buffered < HEADER_SIZE) break;
+            expected = take(HEADER_SIZE).readUInt32BE(0);
         }
+        if (buffered < expected) break;
+        const body = take(expected);
+        expected = -1;
+        // 命令按到达顺序串行处理，保证响应帧与请求一一对应。
+        queue = queue.then(() => handleFrame(body));
     }
 });
 
@@ -359,6 +385,5 @@ process.stdin.on('end', () => {
 });
 
 process.on('uncaughtException', (err) => {
-    const errResp = { status: 'error', message: `Uncaught: ${err.message}` };
-    process.stdout.write(JSON.stringify(errResp) + '\n');
+    writeFrame({ status: 'error', message: `Uncaught: ${err.message}` });
 });
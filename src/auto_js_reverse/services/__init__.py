@@ -1,13 +1,16 @@
 from .browser_connector import BrowserConnector
 from .embedding_service import EmbeddingService
 from .index_manager import IndexManager
-from .node_bridge import NodeBridge
+from .node_bridge import NodeBridge, NodeWorkerPool
 from .pipeline import Pipeline
+from .semantic_cache import SemanticCache
 
 __all__ = [
     "BrowserConnector",
     "EmbeddingService",
     "IndexManager",
     "NodeBridge",
+    "NodeWorkerPool",
     "Pipeline",
+    "SemanticCache",
 ]
@@ -6,17 +6,106 @@ import json
 import logging
 import os
 import platform
+import re
 import shutil
-import subprocess
+from collections import Counter, deque
+from contextlib import contextmanager
+from functools import lru_cache
 from pathlib import Path
-from typing import Any, Optional
-from urllib.parse import urlparse
+from typing import Any, Callable, Iterable, Iterator, Optional
+from urllib.parse import urljoin, urlparse
 
 import websockets
 from websockets.exceptions import ConnectionClosed, InvalidURI
 
+from .http_client import get_session
+
+try:
+    import orjson
+except ImportError:  # 可选加速依赖，未安装时回退到标准库 json
+    orjson = None
+
 logger = logging.getLogger(__name__)
 
+# 事件缓冲上限：超出后丢弃最旧的事件，避免长时间监听时内存无限增长。
+EVENT_BUFFER_SIZE = 10000
+
+# Chrome 下发的事件帧以 {"method":" 开头，读循环据此在解析前取出方法名，
+# 未被订阅的事件直接丢弃，省去整帧 JSON 解析与对象分配。
+_EVENT_PREFIX = b'{"method":"'
+_EVENT_PREFIX_LEN = len(_EVENT_PREFIX)
+_BINDING_CALLED = b"Runtime.bindingCalled"
+
+# get_all_scripts 使用的表达式保持为固定字符串：V8 按源码缓存编译结果，
+# 源码不变即可命中编译缓存。不改用 Runtime.compileScript，因为它要求先
+# Runtime.enable，而启用 Runtime 域可被页面反调试脚本探测到。
+_LIST_SCRIPTS_PARAMS: dict[str, Any] = {
+    "expression": """
+(() => {
+    const scripts = Array.from(document.querySelectorAll('script[src]'));
+    return scripts.map(s => ({
+        src: s.src,
+        type: s.type || 'text/javascript'
+    }));
+})()
+""",
+    "returnByValue": True,
+}
+
+# 自动启动 Chrome 后等待调试端口就绪的总时长与探测退避参数（秒）。
+CHROME_READY_TIMEOUT = 10.0
+CHROME_PROBE_TIMEOUT = 0.5
+CHROME_PROBE_INITIAL_DELAY = 0.05
+CHROME_PROBE_MAX_DELAY = 0.5
+
+# 自动启动 Chrome 时附加的参数：跳过首次运行引导，并关闭启动阶段与调试无关的
+# 同步、默认应用安装和翻译服务，缩短冷启动时间。不改动代理与扩展设置，
+# 以免影响需要代理访问目标站点的用户。
+CHROME_LAUNCH_FLAGS = (
+    "--no-first-run",
+    "--no-default-browser-check",
+    "--disable-default-apps",
+    "--disable-sync",
+    "--disable-features=Translate",
+)
+
+# 标签页 URL、导航目标在重连与匹配过程中被反复解析，结果不可变，可直接缓存。
+_parse_url = lru_cache(maxsize=4096)(urlparse)
+
+# 单个资源下载的总超时（秒），避免慢速脚本或 source map 服务拖住整次捕获。
+DOWNLOAD_TIMEOUT = 30.0
+# 下载资源时每次从响应流读取的分块大小。
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+# 按 Content-Length 预分配下载缓冲区的上限，超出部分走追加路径按实际到达的数据增长，
+# 避免服务端声明超大长度时在收到正文前就分配出巨大的缓冲区。
+DOWNLOAD_PREALLOC_LIMIT = 8 * 1024 * 1024
+
+# sourceMappingURL 注释只会出现在脚本末尾，只在最后这么多字节里查找。
+SOURCE_MAP_COMMENT_WINDOW = 4096
+_SOURCE_MAP_COMMENT = re.compile(
+    rb"//[#@][ \t]*sourceMappingURL=[ \t]*(\S+)[ \t\r]*$", re.M
+)
+
+
+def _new_sha256() -> Any:
+    # 文件哈希仅用于去重，不涉及安全用途，可选用最快的实现。
+    return hashlib.sha256(usedforsecurity=False)
+
+
+def _json_loads(data: str | bytes) -> Any:
+    # orjson.JSONDecodeError 继承自 json.JSONDecodeError，调用方按标准库异常捕获即可。
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def _encode_message(msg: dict[str, Any]) -> bytes:
+    # 返回 UTF-8 bytes，发送时以 text=True 直接作为文本帧写出，省去 str 往返编码。
+    if orjson is not None:
+        return orjson.dumps(msg)
+    return json.dumps(msg).encode("utf-8")
+
+
 CHROME_PATHS: dict[str, list[str]] = {
     "Darwin": [
         "/Applications/Google Chrome.app/Contents/MacOS/Google Chrome",
@@ -42,7 +131,18 @@ CHROME_PATHS: dict[str, list[str]] = {
 }
 
 
+# 已定位到的浏览器路径；未找到时不缓存，以便安装浏览器后无需重启即可生效。
+_resolved_chrome_bin: Optional[str] = None
+
+
 def _find_chrome_binary() -> Optional[str]:
+    global _resolved_chrome_bin
+    if _resolved_chrome_bin is None:
+        _resolved_chrome_bin = _scan_chrome_binary()
+    return _resolved_chrome_bin
+
+
+def _scan_chrome_binary() -> Optional[str]:
     system = platform.system()
     candidates = CHROME_PATHS.get(system, [])
 
@@ -52,7 +152,7 @@ def _find_chrome_binary() -> Optional[str]:
             if found:
                 return found
         else:
-            if Path(candidate).exists():
+            if os.path.isfile(candidate):
                 return candidate
 
     for name in ("chrome", "chromium", "google-chrome"):
@@ -63,9 +163,8 @@ def _find_chrome_binary() -> Optional[str]:
     return None
 
 
-def _no_proxy_env() -> dict[str, str]:
-    env = os.environ.copy()
-    for key in (
+PROXY_ENV_KEYS = frozenset(
+    {
         "ALL_PROXY",
         "all_proxy",
         "HTTPS_PROXY",
@@ -74,8 +173,15 @@ def _no_proxy_env() -> dict[str, str]:
         "http_proxy",
         "SOCKS_PROXY",
         "socks_proxy",
-    ):
-        env.pop(key, None)
+    }
+)
+
+
+def _no_proxy_env() -> dict[str, str]:
+    env = os.environ.copy()
+    # 多数环境未设置代理变量，只删除实际存在的键。
+    for key in PROXY_ENV_KEYS.intersection(env):
+        del env[key]
     env["NO_PROXY"] = "localhost,127.0.0.1"
     env["no_proxy"] = "localhost,127.0.0.1"
     return env
@@ -101,13 +207,35 @@ class BrowserConnector:
         self._user_data_dir = user_data_dir
         self._ws: Optional[websockets.WebSocketClientProtocol] = None
         self._msg_id = 0
+        # 当前连接上已启用的 CDP 域（Page、Network 等），重连后清空。
+        self._enabled_domains: set[str] = set()
+        # _is_ws_open 的状态探针，针对当前连接对象解析一次后复用。
+        self._ws_open_probe: Callable[[], bool] = lambda: False
+        self._ws_open_probe_target: Any = None
         self._debugger_url: Optional[str] = None
-        self._chrome_process: Optional[subprocess.Popen] = None
+        self._chrome_process: Optional[asyncio.subprocess.Process] = None
         self._launched_by_us = False
         self._connected_tab_url: Optional[str] = None
         self._pending_commands: dict[int, asyncio.Future] = {}
-        self._event_queue: asyncio.Queue = asyncio.Queue()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._events: deque[dict] = deque(maxlen=EVENT_BUFFER_SIZE)
+        self._event_available = asyncio.Event()
         self._reader_task: Optional[asyncio.Task] = None
+        self._binding_handlers: dict[str, Callable[[str], None]] = {}
+        # 事件方法名（bytes）-> 订阅计数；只有被订阅的事件才会解析并进入缓冲区。
+        self._event_subscriptions: Counter[bytes] = Counter()
+
+    @contextmanager
+    def _subscribe_events(self, *methods: str) -> Iterator[None]:
+        keys = [method.encode() for method in methods]
+        self._event_subscriptions.update(keys)
+        try:
+            yield
+        finally:
+            self._event_subscriptions.subtract(keys)
+            for key in keys:
+                if self._event_subscriptions[key] <= 0:
+                    del self._event_subscriptions[key]
 
     async def _start_reader(self) -> None:
         if self._reader_task and not self._reader_task.done():
@@ -127,45 +255,64 @@ class BrowserConnector:
         try:
             while self._ws:
                 try:
-                    raw = await self._ws.recv()
+                    # decode=False 跳过文本帧的 UTF-8 解码校验，直接把 bytes 交给 JSON 解析。
+                    raw = await self._ws.recv(decode=False)
                 except ConnectionClosed:
                     logger.warning("WebSocket 连接已关闭，reader 退出")
                     break
+                if raw[:_EVENT_PREFIX_LEN] == _EVENT_PREFIX:
+                    method_end = raw.find(b'"', _EVENT_PREFIX_LEN)
+                    method = raw[_EVENT_PREFIX_LEN:method_end]
+                    if (
+                        method not in self._event_subscriptions
+                        and method != _BINDING_CALLED
+                    ):
+                        continue
                 try:
-                    msg = json.loads(raw)
+                    msg = _json_loads(raw)
                 except json.JSONDecodeError:
                     logger.debug("收到非 JSON 消息，跳过")
                     continue
                 msg_id = msg.get("id")
-                if msg_id is not None and msg_id in self._pending_commands:
-                    fut = self._pending_commands[msg_id]
+                # 响应到达即从等待表中移除，发送方只需在超时/取消时自行清理。
+                fut = (
+                    self._pending_commands.pop(msg_id, None)
+                    if msg_id is not None
+                    else None
+                )
+                if fut is not None:
                     if not fut.done():
                         fut.set_result(msg)
                 elif "method" in msg:
-                    try:
-                        self._event_queue.put_nowait(msg)
-                    except asyncio.QueueFull:
-                        pass
+                    if msg["method"] == "Runtime.bindingCalled":
+                        params = msg.get("params", {})
+                        handler = self._binding_handlers.get(params.get("name", ""))
+                        if handler is not None:
+                            try:
+                                handler(params.get("payload", ""))
+                            except Exception as e:
+                                logger.debug("binding 回调异常: %s", e)
+                            continue
+                    self._events.append(msg)
+                    self._event_available.set()
         except asyncio.CancelledError:
             pass
 
-    async def _is_cdp_available(self) -> bool:
+    async def _is_cdp_available(self, timeout: float = 2.0) -> bool:
         import aiohttp
 
-        url = f"http://{self._host}:{self._port}/json"
+        # /json/version 只返回浏览器版本信息，比 /json 的完整标签页列表轻量得多。
+        url = f"http://{self._host}:{self._port}/json/version"
         try:
-            connector = aiohttp.TCPConnector(force_close=True)
-            async with aiohttp.ClientSession(
-                connector=connector, trust_env=False
-            ) as session:
-                async with session.get(
-                    url, timeout=aiohttp.ClientTimeout(total=2)
-                ) as resp:
-                    return resp.status == 200
+            session = await get_session()
+            async with session.get(
+                url, timeout=aiohttp.ClientTimeout(total=timeout)
+            ) as resp:
+                return resp.status == 200
         except Exception:
             return False
 
-    def _launch_chrome(self) -> None:
+    async def _launch_chrome(self) -> None:
         chrome_bin = _find_chrome_binary()
         if not chrome_bin:
             raise RuntimeError(
@@ -176,8 +323,7 @@ class BrowserConnector:
         args = [
             chrome_bin,
             f"--remote-debugging-port={self._port}",
-            "--no-first-run",
-            "--no-default-browser-check",
+            *CHROME_LAUNCH_FLAGS,
         ]
 
         if self._headless:
@@ -194,10 +340,10 @@ class BrowserConnector:
         args.append("about:blank")
 
         logger.info("自动启动 Chrome: %s", chrome_bin)
-        self._chrome_process = subprocess.Popen(
-            args,
-            stdout=subprocess.DEVNULL,
-            stderr=subprocess.DEVNULL,
+        self._chrome_process = await asyncio.create_subprocess_exec(
+            *args,
+            stdout=asyncio.subprocess.DEVNULL,
+            stderr=asyncio.subprocess.DEVNULL,
             env=_no_proxy_env(),
         )
         self._launched_by_us = True
@@ -209,14 +355,11 @@ class BrowserConnector:
         last_err: Optional[Exception] = None
         for attempt in range(3):
             try:
-                connector = aiohttp.TCPConnector(force_close=True)
-                async with aiohttp.ClientSession(
-                    connector=connector, trust_env=False
-                ) as session:
-                    async with session.get(
-                        url, timeout=aiohttp.ClientTimeout(total=5)
-                    ) as resp:
-                        return await resp.json()
+                session = await get_session()
+                async with session.get(
+                    url, timeout=aiohttp.ClientTimeout(total=5)
+                ) as resp:
+                    return await resp.json()
             except Exception as e:
                 last_err = e
                 if attempt < 2:
@@ -226,34 +369,51 @@ class BrowserConnector:
         )
 
     @staticmethod
-    def _url_matches_target(page_url: str, target_url: str) -> bool:
-        page_parsed = urlparse(page_url or "")
-        target_parsed = urlparse(target_url)
-        target_domain = target_parsed.netloc.lower()
-        target_path = target_parsed.path.rstrip("/")
-        page_domain = page_parsed.netloc.lower()
-        page_path = page_parsed.path.rstrip("/")
-
-        if target_domain != page_domain:
+    def _parse_target(target_url: str) -> tuple[str, str]:
+        target_parsed = _parse_url(target_url)
+        return target_parsed.netloc.lower(), target_parsed.path.rstrip("/")
+
+    @staticmethod
+    def _page_matches(page_url: str, target_domain: str, target_path: str) -> bool:
+        page_parsed = _parse_url(page_url or "")
+        page_domain = page_parsed.netloc
+        # 主机名通常已是小写，先做直接比较，不相等时才分配小写副本。
+        if page_domain != target_domain and page_domain.lower() != target_domain:
             return False
 
-        return (
-            not target_path
-            or target_path == "/"
-            or page_path.startswith(target_path)
+        if not target_path or target_path == "/":
+            return True
+        page_path = page_parsed.path
+        if page_path.endswith("/"):
+            page_path = page_path.rstrip("/")
+        return page_path.startswith(target_path)
+
+    @staticmethod
+    def _url_matches_target(page_url: str, target_url: str) -> bool:
+        if page_url == target_url:
+            return True
+        return BrowserConnector._page_matches(
+            page_url, *BrowserConnector._parse_target(target_url)
         )
 
     def _match_tab(self, tabs: list[dict], target_url: str) -> Optional[dict]:
-        target_parsed = urlparse(target_url)
-        target_domain = target_parsed.netloc.lower()
+        # 目标 URL 只解析一次；Chrome 返回的 URL 已规范化（主机名小写），
+        # http(s) 标签页不以 scheme://目标域名 开头即可直接排除，无需解析。
+        target_domain, target_path = self._parse_target(target_url)
         if not target_domain:
             return None
+        prefixes = ("http://" + target_domain, "https://" + target_domain)
 
         for tab in tabs:
             if tab.get("type") != "page" or "webSocketDebuggerUrl" not in tab:
                 continue
             tab_url = tab.get("url", "")
-            if self._url_matches_target(tab_url, target_url):
+            if not tab_url.startswith(prefixes):
+                if tab_url.startswith(("http://", "https://")):
+                    continue
+                if target_domain not in tab_url.lower():
+                    continue
+            if self._page_matches(tab_url, target_domain, target_path):
                 return tab
 
         return None
@@ -264,6 +424,11 @@ class BrowserConnector:
                 websockets.connect(
                     debugger_url,
                     max_size=50 * 1024 * 1024,
+                    # 本机回环连接，关闭 permessage-deflate 省去逐帧解压。
+                    compression=None,
+                    # 导航与抓包时 CDP 事件成批涌入，放宽接收队列高水位，
+                    # 避免读取协程稍有延迟就暂停从 socket 读取。
+                    max_queue=1024,
                     additional_headers={"Host": f"{self._host}:{self._port}"},
                     proxy=None,
                 ),
@@ -271,12 +436,12 @@ class BrowserConnector:
             )
         except asyncio.TimeoutError:
             raise ConnectionRefusedError(f"WebSocket 连接超时 (10s): {debugger_url}")
+        # 连接绑定在当前事件循环上，缓存下来供命令创建 Future 使用。
+        self._loop = asyncio.get_running_loop()
         self._pending_commands.clear()
-        while not self._event_queue.empty():
-            try:
-                self._event_queue.get_nowait()
-            except asyncio.QueueEmpty:
-                break
+        self._enabled_domains.clear()
+        self._events.clear()
+        self._event_available = asyncio.Event()
         await self._start_reader()
 
     async def _ensure_cdp_available(self) -> None:
@@ -290,15 +455,22 @@ class BrowserConnector:
             )
 
         logger.info("未检测到 Chrome 远程调试端口，尝试自动启动...")
-        self._launch_chrome()
-        for i in range(10):
-            await asyncio.sleep(1)
-            if await self._is_cdp_available():
-                logger.info("Chrome 已就绪 (等待 %d 秒)", i + 1)
+        await self._launch_chrome()
+        # Chrome 冷启动通常只需几百毫秒，按指数退避探测端口而非固定每秒轮询。
+        now = asyncio.get_running_loop().time
+        started = now()
+        deadline = started + CHROME_READY_TIMEOUT
+        delay = CHROME_PROBE_INITIAL_DELAY
+        while now() < deadline:
+            if await self._is_cdp_available(timeout=CHROME_PROBE_TIMEOUT):
+                logger.info("Chrome 已就绪 (等待 %.2f 秒)", now() - started)
                 return
+            await asyncio.sleep(delay)
+            delay = min(delay * 1.7, CHROME_PROBE_MAX_DELAY)
 
         if self._chrome_process:
             self._chrome_process.kill()
+            await self._chrome_process.wait()
             self._chrome_process = None
         raise RuntimeError("Chrome 已启动但 CDP 端口未就绪，请检查端口是否被占用。")
 
@@ -328,10 +500,17 @@ class BrowserConnector:
         self._debugger_url = selected_tab["webSocketDebuggerUrl"]
         self._connected_tab_url = selected_tab.get("url", "")
 
-        available_tabs = [
-            t for t in tabs if t.get("type") == "page" and "webSocketDebuggerUrl" in t
-        ]
-        failed_debugger_urls: set[str] = set()
+        # 备选标签页按原顺序排队；连接失败的标签页移入 failed_tabs，
+        # 仅当未尝试过的候选耗尽后才轮换重试。
+        current_tab = selected_tab
+        candidates = deque(
+            t
+            for t in tabs
+            if t.get("type") == "page"
+            and "webSocketDebuggerUrl" in t
+            and t["webSocketDebuggerUrl"] != self._debugger_url
+        )
+        failed_tabs: deque[dict] = deque()
 
         for attempt in range(self._max_reconnect):
             try:
@@ -356,26 +535,20 @@ class BrowserConnector:
                     e,
                 )
                 if attempt < self._max_reconnect - 1:
-                    failed_debugger_urls.add(self._debugger_url)
+                    failed_tabs.append(current_tab)
                     fallback = None
-                    for t in available_tabs:
-                        candidate_ws_url = t["webSocketDebuggerUrl"]
-                        if (
-                            candidate_ws_url != self._debugger_url
-                            and candidate_ws_url not in failed_debugger_urls
-                        ):
-                            fallback = t
-                            break
-                    if fallback is None:
+                    if candidates:
+                        fallback = candidates.popleft()
+                    elif len(failed_tabs) > 1:
                         # 未失败 tab 已穷尽后，才允许重试历史失败 tab。
-                        for t in available_tabs:
-                            if t["webSocketDebuggerUrl"] != self._debugger_url:
-                                fallback = t
-                                break
+                        fallback = failed_tabs.popleft()
                     if fallback:
                         logger.info("尝试备选标签页: %s", fallback.get("url", ""))
                         self._debugger_url = fallback["webSocketDebuggerUrl"]
                         self._connected_tab_url = fallback.get("url", "")
+                        current_tab = fallback
+                    else:
+                        failed_tabs.pop()
                     await asyncio.sleep(self._reconnect_interval)
                 else:
                     raise ConnectionRefusedError(
@@ -389,25 +562,28 @@ class BrowserConnector:
             await self.navigate(target_url)
 
     async def navigate(self, url: str, timeout: float = 15.0) -> str:
-        await self._send_command("Page.enable")
-        self._drain_events()
-        await self._send_command("Page.navigate", {"url": url})
-
-        end_time = asyncio.get_event_loop().time() + timeout
-        loaded = False
-        while asyncio.get_event_loop().time() < end_time:
-            remaining = end_time - asyncio.get_event_loop().time()
-            if remaining <= 0:
-                break
-            try:
-                event = await asyncio.wait_for(
-                    self._event_queue.get(), timeout=min(remaining, 0.5)
-                )
-                if event.get("method") == "Page.loadEventFired":
+        with self._subscribe_events("Page.loadEventFired"):
+            self._drain_events()
+            commands: list[tuple[str, dict[str, Any] | None]] = []
+            if "Page" not in self._enabled_domains:
+                commands.append(("Page.enable", None))
+            commands.append(("Page.navigate", {"url": url}))
+            await self._send_batch(commands)
+            self._enabled_domains.add("Page")
+
+            # 只订阅了 loadEventFired，缓冲中出现事件即可唤醒，直接按剩余时长
+            # 阻塞等待，无需定时轮询。
+            now = self._loop.time
+            end_time = now() + timeout
+            loaded = False
+            while True:
+                remaining = end_time - now()
+                if remaining <= 0:
+                    break
+                event = await self._next_event(timeout=remaining)
+                if event is not None and event.get("method") == "Page.loadEventFired":
                     loaded = True
                     break
-            except asyncio.TimeoutError:
-                continue
 
         if not loaded:
             logger.warning("等待页面加载超时 (%.1fs)，继续执行: %s", timeout, url)
@@ -416,30 +592,34 @@ class BrowserConnector:
         logger.info("已导航到: %s", current)
         return current
 
-    def _is_ws_open(self) -> bool:
-        if not self._ws:
-            return False
-
-        state = getattr(self._ws, "state", None)
+    @staticmethod
+    def _resolve_open_probe(ws: Any) -> Callable[[], bool]:
+        """按 websockets 版本差异为连接对象挑选一次状态读取方式，返回无参探针。"""
+        state = getattr(ws, "state", None)
         if state is not None:
-            state_name = getattr(state, "name", None)
-            if isinstance(state_name, str):
-                return state_name.upper() == "OPEN"
-            state_value = getattr(state, "value", None)
-            if isinstance(state_value, int):
-                return state_value == 1
+            if isinstance(getattr(state, "name", None), str):
+                return lambda: ws.state.name.upper() == "OPEN"
+            if isinstance(getattr(state, "value", None), int):
+                return lambda: ws.state.value == 1
             if isinstance(state, int):
-                return state == 1
+                return lambda: ws.state == 1
+
+        if isinstance(getattr(ws, "open", None), bool):
+            return lambda: ws.open
 
-        open_attr = getattr(self._ws, "open", None)
-        if isinstance(open_attr, bool):
-            return open_attr
+        if isinstance(getattr(ws, "closed", None), bool):
+            return lambda: not ws.closed
 
-        closed_attr = getattr(self._ws, "closed", None)
-        if isinstance(closed_attr, bool):
-            return not closed_attr
+        return lambda: True
 
-        return True
+    def _is_ws_open(self) -> bool:
+        ws = self._ws
+        if not ws:
+            return False
+        if self._ws_open_probe_target is not ws:
+            self._ws_open_probe = self._resolve_open_probe(ws)
+            self._ws_open_probe_target = ws
+        return self._ws_open_probe()
 
     @property
     def is_connected(self) -> bool:
@@ -457,11 +637,11 @@ class BrowserConnector:
             "method": "Runtime.evaluate",
             "params": {"expression": "1"},
         }
-        future: asyncio.Future = asyncio.get_event_loop().create_future()
+        future: asyncio.Future = self._loop.create_future()
         self._pending_commands[cmd_id] = future
 
         try:
-            await self._ws.send(json.dumps(msg))
+            await self._ws.send(_encode_message(msg), text=True)
         except asyncio.CancelledError:
             self._pending_commands.pop(cmd_id, None)
             raise
@@ -471,11 +651,11 @@ class BrowserConnector:
         try:
             resp = await asyncio.wait_for(future, timeout=5.0)
         except asyncio.CancelledError:
+            self._pending_commands.pop(cmd_id, None)
             raise
         except Exception:
-            return False
-        finally:
             self._pending_commands.pop(cmd_id, None)
+            return False
 
         return isinstance(resp, dict) and "error" not in resp
 
@@ -506,45 +686,120 @@ class BrowserConnector:
         if params:
             msg["params"] = params
 
-        future: asyncio.Future = asyncio.get_event_loop().create_future()
+        loop = self._loop
+        future: asyncio.Future = loop.create_future()
         self._pending_commands[cmd_id] = future
 
         try:
-            await self._ws.send(json.dumps(msg))
+            await self._ws.send(_encode_message(msg), text=True)
         except ConnectionClosed:
             self._pending_commands.pop(cmd_id, None)
             logger.warning("发送 CDP 命令时连接已断开，尝试重连: %s", method)
             await self.connect()
-            future = asyncio.get_event_loop().create_future()
+            future = loop.create_future()
             self._pending_commands[cmd_id] = future
             if not self._ws:
                 self._pending_commands.pop(cmd_id, None)
                 raise RuntimeError("CDP 重连失败")
-            await self._ws.send(json.dumps(msg))
+            await self._ws.send(_encode_message(msg), text=True)
 
         try:
             resp = await asyncio.wait_for(future, timeout=30.0)
         except asyncio.TimeoutError:
             self._pending_commands.pop(cmd_id, None)
             raise RuntimeError(f"CDP 命令超时: {method}")
-        finally:
+        except asyncio.CancelledError:
             self._pending_commands.pop(cmd_id, None)
+            raise
 
         if "error" in resp:
             raise RuntimeError(f"CDP Error: {resp['error']}")
         return resp.get("result", {})
 
-    async def evaluate(self, expression: str, return_by_value: bool = True) -> Any:
+    async def _send_batch(
+        self, commands: list[tuple[str, dict[str, Any] | None]]
+    ) -> list[dict]:
+        """连续写出多条互不依赖的 CDP 命令后再统一等待响应。
+
+        CDP 要求每帧只携带一个 JSON 对象，无法合并为单帧；但各次 send 之间
+        没有其他 await，写缓冲会在同一轮事件循环内被一并刷出，省去逐条往返。
+        """
+        if not commands:
+            return []
+        if not self._ws:
+            await self.connect()
+
+        loop = self._loop
+        msgs: list[dict] = []
+        futures: list[asyncio.Future] = []
+        for method, params in commands:
+            self._msg_id += 1
+            msg = {"id": self._msg_id, "method": method}
+            if params:
+                msg["params"] = params
+            msgs.append(msg)
+            future: asyncio.Future = loop.create_future()
+            self._pending_commands[self._msg_id] = future
+            futures.append(future)
+
+        def _discard() -> None:
+            for msg in msgs:
+                self._pending_commands.pop(msg["id"], None)
+
+        try:
+            for msg in msgs:
+                await self._ws.send(_encode_message(msg), text=True)
+        except ConnectionClosed:
+            _discard()
+            logger.warning(
+                "批量发送 CDP 命令时连接已断开，尝试重连: %s",
+                ", ".join(method for method, _ in commands),
+            )
+            await self.connect()
+            if not self._ws:
+                raise RuntimeError("CDP 重连失败")
+            futures = [loop.create_future() for _ in msgs]
+            for msg, future in zip(msgs, futures):
+                self._pending_commands[msg["id"]] = future
+            for msg in msgs:
+                await self._ws.send(_encode_message(msg), text=True)
+
+        try:
+            responses = await asyncio.wait_for(asyncio.gather(*futures), timeout=30.0)
+        except asyncio.TimeoutError:
+            _discard()
+            raise RuntimeError(
+                "CDP 命令超时: " + ", ".join(method for method, _ in commands)
+            )
+        except asyncio.CancelledError:
+            _discard()
+            raise
+
+        results = []
+        for resp in responses:
+            if "error" in resp:
+                raise RuntimeError(f"CDP Error: {resp['error']}")
+            results.append(resp.get("result", {}))
+        return results
+
+    async def evaluate(
+        self,
+        expression: str,
+        return_by_value: bool = True,
+        generate_preview: bool = False,
+    ) -> Any:
+        """执行表达式并返回结果值。
+
+        generate_preview 默认关闭：对象预览只会增大响应体，返回值本身用不到。
+        """
         await self.ensure_connected()
-        result = await self._send_command(
-            "Runtime.evaluate",
-            {
-                "expression": expression,
-                "returnByValue": return_by_value,
-                "awaitPromise": True,
-                "generatePreview": True,
-            },
-        )
+        params: dict[str, Any] = {
+            "expression": expression,
+            "returnByValue": return_by_value,
+            "awaitPromise": True,
+            "generatePreview": generate_preview,
+        }
+        result = await self._send_command("Runtime.evaluate", params)
         if "exceptionDetails" in result:
             exc = result["exceptionDetails"]
             text = exc.get("text", "")
@@ -553,74 +808,129 @@ class BrowserConnector:
             raise RuntimeError(f"JS 执行异常: {desc}")
         return result.get("result", {}).get("value")
 
+    async def add_binding(self, name: str, handler: Callable[[str], None]) -> None:
+        """注册页面全局函数 window[name]，页面每次调用时以 payload 字符串回调 handler。"""
+        await self.ensure_connected()
+        self._binding_handlers[name] = handler
+        try:
+            await self._send_command("Runtime.addBinding", {"name": name})
+        except Exception:
+            self._binding_handlers.pop(name, None)
+            raise
+
+    async def remove_binding(self, name: str) -> None:
+        self._binding_handlers.pop(name, None)
+        if not self._ws:
+            return
+        try:
+            await self._send_command("Runtime.removeBinding", {"name": name})
+        except Exception as e:
+            logger.debug("移除 binding %s 失败: %s", name, e)
+
+    async def _enable(self, domain: str) -> None:
+        if domain in self._enabled_domains:
+            return
+        await self._send_command(f"{domain}.enable")
+        self._enabled_domains.add(domain)
+
     async def enable_network(self) -> None:
         await self.ensure_connected()
-        await self._send_command("Network.enable")
+        await self._enable("Network")
 
     async def disable_network(self) -> None:
         await self.ensure_connected()
+        self._enabled_domains.discard("Network")
         try:
             await self._send_command("Network.disable")
         except Exception:
             pass
 
-    def _drain_events(self) -> list[dict]:
-        events = []
-        while not self._event_queue.empty():
-            try:
-                events.append(self._event_queue.get_nowait())
-            except asyncio.QueueEmpty:
-                break
+    async def stop_collecting(self) -> None:
+        """关闭采集期间保持启用的 Network 域，Chrome 随之停止推送网络事件并释放资源缓冲。"""
+        if "Network" in self._enabled_domains and self._is_ws_open():
+            await self.disable_network()
+
+    def _drain_events(self) -> deque[dict]:
+        # 直接换入新的空缓冲区，O(1) 取走全部积压事件，无需逐条复制。
+        events, self._events = self._events, deque(maxlen=EVENT_BUFFER_SIZE)
+        self._event_available.clear()
         return events
 
-    async def collect_network_events(self, duration_sec: float = 10.0) -> list[dict]:
-        self._drain_events()
-        await self.enable_network()
+    async def _next_event(self, timeout: float) -> Optional[dict]:
+        """取出最早的一条事件；缓冲为空时最多等待 timeout 秒，超时返回 None。"""
+        if not self._events:
+            self._event_available.clear()
+            try:
+                await asyncio.wait_for(self._event_available.wait(), timeout=timeout)
+            except asyncio.TimeoutError:
+                return None
+        return self._events.popleft() if self._events else None
+
+    async def collect_network_events(
+        self, duration_sec: float = 10.0, min_count: Optional[int] = None
+    ) -> list[dict]:
+        """采集 duration_sec 秒内发出的网络请求。
+
+        指定 min_count 时，捕获到的请求数达到该值即提前返回，不必等满整个时长；
+        此时个别请求的 response 可能尚未到达，保持为 None。
+        """
         requests_map: dict[str, dict] = {}
 
-        end_time = asyncio.get_event_loop().time() + duration_sec
-        try:
-            while asyncio.get_event_loop().time() < end_time:
-                remaining = end_time - asyncio.get_event_loop().time()
-                if remaining <= 0:
-                    break
-                try:
-                    event = await asyncio.wait_for(
-                        self._event_queue.get(), timeout=min(remaining, 0.5)
-                    )
-                    method = event.get("method", "")
-
-                    if method == "Network.requestWillBeSent":
-                        params = event.get("params", {})
-                        req_id = params.get("requestId", "")
-                        request = params.get("request", {})
-                        requests_map[req_id] = {
-                            "requestId": req_id,
-                            "url": request.get("url", ""),
-                            "method": request.get("method", ""),
-                            "headers": request.get("headers", {}),
-                            "postData": request.get("postData", ""),
-                            "type": params.get("type", ""),
-                            "initiator": params.get("initiator", {}).get("type", ""),
-                            "response": None,
-                        }
-
-                    elif method == "Network.responseReceived":
-                        params = event.get("params", {})
-                        req_id = params.get("requestId", "")
-                        response = params.get("response", {})
-                        if req_id in requests_map:
-                            requests_map[req_id]["response"] = {
-                                "status": response.get("status", 0),
-                                "statusText": response.get("statusText", ""),
-                                "headers": response.get("headers", {}),
-                                "mimeType": response.get("mimeType", ""),
-                            }
-
-                except asyncio.TimeoutError:
-                    continue
-        finally:
-            await self.disable_network()
+        def _on_request(params: dict) -> None:
+            req_id = params.get("requestId", "")
+            request = params.get("request", {})
+            requests_map[req_id] = {
+                "requestId": req_id,
+                "url": request.get("url", ""),
+                "method": request.get("method", ""),
+                "headers": request.get("headers", {}),
+                "postData": request.get("postData", ""),
+                "type": params.get("type", ""),
+                "initiator": params.get("initiator", {}).get("type", ""),
+                "response": None,
+            }
+
+        def _on_response(params: dict) -> None:
+            entry = requests_map.get(params.get("requestId", ""))
+            if entry is None:
+                return
+            response = params.get("response", {})
+            entry["response"] = {
+                "status": response.get("status", 0),
+                "statusText": response.get("statusText", ""),
+                "headers": response.get("headers", {}),
+                "mimeType": response.get("mimeType", ""),
+            }
+
+        handlers: dict[str, Callable[[dict], None]] = {
+            "Network.requestWillBeSent": _on_request,
+            "Network.responseReceived": _on_response,
+        }
+        get_handler = handlers.get
+
+        async def _consume() -> None:
+            # 有积压事件时连续处理，缓冲区取空后才挂起等待下一次通知。
+            while True:
+                events = self._events
+                while events:
+                    event = events.popleft()
+                    handler = get_handler(event.get("method", ""))
+                    if handler is not None:
+                        handler(event.get("params", {}))
+                if min_count is not None and len(requests_map) >= min_count:
+                    return
+                self._event_available.clear()
+                await self._event_available.wait()
+
+        with self._subscribe_events(*handlers):
+            self._drain_events()
+            await self.enable_network()
+            # Network 域保持启用，重复采集无需再次 enable/disable 往返；
+            # 未订阅的网络事件会在读循环中按前缀直接丢弃。
+            try:
+                await asyncio.wait_for(_consume(), timeout=duration_sec)
+            except asyncio.TimeoutError:
+                pass
 
         return list(requests_map.values())
 
@@ -646,16 +956,19 @@ class BrowserConnector:
                 fut.cancel()
         self._pending_commands.clear()
 
-    def shutdown_chrome(self) -> None:
+    async def shutdown_chrome(self) -> None:
         if self._launched_by_us and self._chrome_process:
             logger.info(
                 "关闭由 MCP 启动的 Chrome 进程 (PID: %d)", self._chrome_process.pid
             )
-            self._chrome_process.terminate()
             try:
-                self._chrome_process.wait(timeout=5)
-            except subprocess.TimeoutExpired:
+                self._chrome_process.terminate()
+                await asyncio.wait_for(self._chrome_process.wait(), timeout=5)
+            except ProcessLookupError:
+                pass
+            except asyncio.TimeoutError:
                 self._chrome_process.kill()
+                await self._chrome_process.wait()
             self._chrome_process = None
             self._launched_by_us = False
 
@@ -666,53 +979,110 @@ class BrowserConnector:
         return result.get("result", {}).get("value", "")
 
     async def get_document_html(self) -> str:
+        # DOM.getOuterHTML 依赖 DOM.getDocument 返回的 nodeId，两条命令只能串行发送。
         root = await self._send_command("DOM.getDocument", {"depth": -1})
         node_id = root["root"]["nodeId"]
         result = await self._send_command("DOM.getOuterHTML", {"nodeId": node_id})
         return result.get("outerHTML", "")
 
     async def get_all_scripts(self) -> list[dict[str, str]]:
-        result = await self._send_command(
-            "Runtime.evaluate",
-            {
-                "expression": """
-            (() => {
-                const scripts = Array.from(document.querySelectorAll('script[src]'));
-                return JSON.stringify(scripts.map(s => ({
-                    src: s.src,
-                    type: s.type || 'text/javascript'
-                })));
-            })()
-            """,
-                "returnByValue": True,
-            },
-        )
-        raw = result.get("result", {}).get("value", "[]")
-        try:
-            return json.loads(raw)
-        except json.JSONDecodeError:
-            return []
+        result = await self._send_command("Runtime.evaluate", _LIST_SCRIPTS_PARAMS)
+        # returnByValue 下数组随 CDP 响应一并解码，无需再解析一次 JSON 字符串。
+        value = result.get("result", {}).get("value")
+        return value if isinstance(value, list) else []
+
+    async def _stream_resource(
+        self, url: str, hasher: Any = None, headers: Optional[dict[str, str]] = None
+    ) -> Optional[bytearray]:
+        import aiohttp
 
-    async def download_resource(self, url: str) -> Optional[bytes]:
+        session = await get_session()
+        async with session.get(
+            url, timeout=aiohttp.ClientTimeout(total=DOWNLOAD_TIMEOUT)
+        ) as resp:
+            if resp.status != 200:
+                return None
+            if headers is not None:
+                headers.update(resp.headers)
+            # 未压缩响应的 Content-Length 即正文长度，可一次分配好缓冲区原地写入，
+            # 避免分块列表再拼接产生的整段复制；压缩响应解码后长度未知，按需追加。
+            total = 0
+            if not resp.headers.get("Content-Encoding"):
+                total = min(resp.content_length or 0, DOWNLOAD_PREALLOC_LIMIT)
+            buf = bytearray(total)
+            pos = 0
+            async for chunk in resp.content.iter_chunked(DOWNLOAD_CHUNK_SIZE):
+                end = pos + len(chunk)
+                if end <= total:
+                    buf[pos:end] = chunk
+                else:
+                    del buf[pos:]
+                    buf += chunk
+                    total = end
+                pos = end
+                if hasher is not None:
+                    hasher.update(chunk)
+            if pos < len(buf):
+                del buf[pos:]
+            return buf
+
+    async def download_resource(self, url: str) -> Optional[bytearray]:
         try:
-            import aiohttp
-
-            connector = aiohttp.TCPConnector(force_close=True)
-            async with aiohttp.ClientSession(connector=connector) as session:
-                async with session.get(
-                    url, timeout=aiohttp.ClientTimeout(total=30)
-                ) as resp:
-                    if resp.status == 200:
-                        return await resp.read()
+            return await self._stream_resource(url)
         except Exception as e:
             logger.debug("下载资源失败 %s: %s", url, e)
         return None
 
+    async def download_resource_hashed(
+        self, url: str, headers: Optional[dict[str, str]] = None
+    ) -> Optional[tuple[bytearray, str]]:
+        """下载资源并在接收分块时同步计算 SHA-256，省去下载完成后的整段哈希。
+
+        传入 headers 字典时，响应头会写入其中供调用方使用。
+        """
+        hasher = _new_sha256()
+        try:
+            content = await self._stream_resource(url, hasher, headers)
+        except Exception as e:
+            logger.debug("下载资源失败 %s: %s", url, e)
+            return None
+        if content is None:
+            return None
+        return content, hasher.hexdigest()
+
     @staticmethod
-    def compute_hash(content: bytes) -> str:
-        return hashlib.sha256(content).hexdigest()
+    def compute_hash(content: bytes | bytearray | memoryview | Iterable[bytes]) -> str:
+        hasher = _new_sha256()
+        if isinstance(content, (bytes, bytearray, memoryview)):
+            hasher.update(content)
+        else:
+            for chunk in content:
+                hasher.update(chunk)
+        return hasher.hexdigest()
+
+    @staticmethod
+    def find_source_map_url(
+        script_url: str,
+        content: bytes | bytearray,
+        headers: Optional[dict[str, str]] = None,
+    ) -> Optional[str]:
+        """从 SourceMap/X-SourceMap 响应头或脚本末尾的 sourceMappingURL 注释
+        解析 Source Map 地址，未声明或为内联 data: URL 时返回 None。"""
+        ref: Optional[str] = None
+        if headers:
+            for key, value in headers.items():
+                if key.lower() in ("sourcemap", "x-sourcemap") and value:
+                    ref = value.strip()
+                    break
+        if ref is None:
+            tail = bytes(content[-SOURCE_MAP_COMMENT_WINDOW:])
+            matches = _SOURCE_MAP_COMMENT.findall(tail)
+            if matches:
+                ref = matches[-1].decode("utf-8", errors="replace")
+        if not ref or ref.startswith("data:"):
+            return None
+        return urljoin(script_url, ref)
 
     @staticmethod
     def extract_domain(url: str) -> str:
-        parsed = urlparse(url)
-        return parsed.netloc or "unknown"
+        return _parse_url(url).netloc or "unknown"
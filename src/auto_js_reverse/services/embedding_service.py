@@ -1,18 +1,77 @@
 from __future__ import annotations
 
 import asyncio
+import base64
+import hashlib
+import json
 import logging
 import os
-from typing import Optional
+import sys
+from array import array
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Optional, Protocol
 
-import aiohttp
+from .http_client import get_session
+
+try:
+    import orjson
+except ImportError:  # 可选加速依赖，未安装时回退到标准库 json
+    orjson = None
 
 logger = logging.getLogger(__name__)
 
 SILICONFLOW_API_URL = "https://api.siliconflow.cn/v1/embeddings"
 MAX_BATCH_SIZE = 32
-# bge-m3 最大 8192 tokens，代码 token 密度高（约 1 token ≈ 2-3 字符），保守截断
-MAX_TEXT_CHARS = 4000
+# 同时在途的 Embedding API 请求数上限
+DEFAULT_MAX_CONCURRENCY = 8
+# Retry-After 给出的等待时长上限（秒），防止异常响应导致长时间挂起
+MAX_RETRY_AFTER_SEC = 60.0
+# bge-m3 最大 8192 tokens。SentencePiece 切出的每个 token 至少覆盖一个字符，
+# 字符数即 token 数上限，按 8000 字符截断即可保证不超限，无需加载分词器。
+# node_worker 产出的代码块最长 8000 字符，正常情况下不再被截断。
+MAX_TEXT_CHARS = 8000
+
+
+class EmbeddingCache(Protocol):
+    def get_cached_embeddings(self, text_hashes: list[str]) -> dict[str, list[float]]: ...
+
+    def add_cached_embeddings(self, entries: dict[str, list[float]]) -> None: ...
+
+
+def _retry_after_seconds(value: Optional[str]) -> Optional[float]:
+    """解析 Retry-After 头（秒数或 HTTP 日期），无法解析时返回 None。"""
+    if not value:
+        return None
+    try:
+        seconds = float(value)
+    except ValueError:
+        try:
+            retry_at = parsedate_to_datetime(value)
+        except (TypeError, ValueError):
+            return None
+        if retry_at.tzinfo is None:
+            retry_at = retry_at.replace(tzinfo=timezone.utc)
+        seconds = (retry_at - datetime.now(timezone.utc)).total_seconds()
+    return min(max(seconds, 0.0), MAX_RETRY_AFTER_SEC)
+
+
+def _decode_embedding(value: str | list[float]) -> list[float]:
+    if not isinstance(value, str):
+        # 兼容忽略 encoding_format、仍返回浮点数组的服务端。
+        return value
+    vector = array("f", base64.b64decode(value))
+    if sys.byteorder != "little":
+        vector.byteswap()
+    return vector.tolist()
+
+
+def text_cache_key(text: str, model_name: str) -> str:
+    # 模型名参与哈希：切换模型后旧模型的向量不会再被命中，避免新旧向量空间混用。
+    digest = hashlib.blake2b(model_name.encode("utf-8"), digest_size=16)
+    digest.update(b"\0")
+    digest.update(text.encode("utf-8"))
+    return digest.hexdigest()
 
 
 class EmbeddingService:
@@ -22,11 +81,17 @@ class EmbeddingService:
         batch_size: int = 32,
         api_key: Optional[str] = None,
         api_url: Optional[str] = None,
+        cache: Optional[EmbeddingCache] = None,
+        max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
     ):
         self._model_name = model_name
         self._batch_size = min(batch_size, MAX_BATCH_SIZE)
         self._api_key = api_key or os.environ.get("SILICONFLOW_API_KEY", "")
         self._api_url = api_url or SILICONFLOW_API_URL
+        self._cache = cache
+        self._max_concurrency = max(1, max_concurrency)
+        # 限流暂停截止时间（事件循环时钟），由所有在途请求共享。
+        self._resume_at = 0.0
 
         if not self._api_key:
             raise ValueError(
@@ -35,6 +100,8 @@ class EmbeddingService:
             )
 
     async def _request_embeddings(self, texts: list[str]) -> list[list[float]]:
+        import aiohttp
+
         headers = {
             "Authorization": f"Bearer {self._api_key}",
             "Content-Type": "application/json",
@@ -50,62 +117,117 @@ class EmbeddingService:
         payload = {
             "model": self._model_name,
             "input": truncated,
-            "encoding_format": "float",
+            # base64 返回 float32 原始字节，体积约为 JSON 数组的三分之一，解析也只剩一个字符串。
+            "encoding_format": "base64",
         }
 
-        async with aiohttp.ClientSession() as session:
-            for attempt in range(3):
-                async with session.post(
-                    self._api_url,
-                    json=payload,
-                    headers=headers,
-                    timeout=aiohttp.ClientTimeout(total=60),
-                ) as resp:
-                    if resp.status == 429:
+        session = await get_session()
+        now = asyncio.get_running_loop().time
+        for attempt in range(3):
+            # 任一请求遇到 429 后，所有并发请求统一等到暂停截止时间再发出。
+            pause = self._resume_at - now()
+            if pause > 0:
+                await asyncio.sleep(pause)
+            async with session.post(
+                self._api_url,
+                json=payload,
+                headers=headers,
+                timeout=aiohttp.ClientTimeout(total=60),
+            ) as resp:
+                if resp.status == 429:
+                    wait = _retry_after_seconds(resp.headers.get("Retry-After"))
+                    if wait is None:
                         wait = 2**attempt + 1
-                        logger.warning("API 限流 (429)，等待 %ds 后重试", wait)
-                        await asyncio.sleep(wait)
-                        continue
-                    if resp.status != 200:
-                        body = await resp.text()
-                        raise RuntimeError(
-                            f"硅基流动 Embedding API 错误 (HTTP {resp.status}): {body}"
-                        )
-                    result = await resp.json()
-                    break
-            else:
-                raise RuntimeError("硅基流动 Embedding API 限流，重试 3 次仍失败")
+                    self._resume_at = max(self._resume_at, now() + wait)
+                    logger.warning("API 限流 (429)，暂停 %.1fs 后重试", wait)
+                    continue
+                if resp.status != 200:
+                    body = await resp.text()
+                    raise RuntimeError(
+                        f"硅基流动 Embedding API 错误 (HTTP {resp.status}): {body}"
+                    )
+                # 1024 维浮点向量的响应体积大，orjson 可用时直接从 bytes 解析。
+                raw = await resp.read()
+                result = orjson.loads(raw) if orjson is not None else json.loads(raw)
+                break
+        else:
+            raise RuntimeError("硅基流动 Embedding API 限流，重试 3 次仍失败")
 
         data = result.get("data", [])
-        data.sort(key=lambda x: x["index"])
-        return [item["embedding"] for item in data]
+        if any(item["index"] != i for i, item in enumerate(data)):
+            data.sort(key=lambda x: x["index"])
+        return [_decode_embedding(item["embedding"]) for item in data]
+
+    async def _embed_one_batch(
+        self, batch: list[str], batch_no: int, offset: int
+    ) -> list[list[float]]:
+        try:
+            return await self._request_embeddings(batch)
+        except RuntimeError as e:
+            if "413" not in str(e):
+                raise
+        logger.warning("批次 %d 超 token 限制，降级为逐条处理", batch_no)
+        embeddings: list[list[float]] = []
+        for j, text in enumerate(batch):
+            try:
+                embeddings.extend(await self._request_embeddings([text]))
+            except RuntimeError:
+                logger.warning("跳过超长文本 (index=%d, len=%d)", offset + j, len(text))
+                embeddings.append([0.0] * 1024)
+        return embeddings
 
     async def embed_texts(self, texts: list[str]) -> list[list[float]]:
-        all_embeddings: list[list[float]] = []
-        zero_vector: list[float] = [0.0] * 1024
+        # 各批次互不依赖，受信号量限制并发请求，结果按批次顺序拼接。
+        semaphore = asyncio.Semaphore(self._max_concurrency)
 
-        for i in range(0, len(texts), self._batch_size):
-            batch = texts[i : i + self._batch_size]
-            try:
-                embeddings = await self._request_embeddings(batch)
-                all_embeddings.extend(embeddings)
-            except RuntimeError as e:
-                if "413" not in str(e):
-                    raise
-                logger.warning(
-                    "批次 %d 超 token 限制，降级为逐条处理", i // self._batch_size + 1
+        async def _run(i: int) -> list[list[float]]:
+            async with semaphore:
+                return await self._embed_one_batch(
+                    texts[i : i + self._batch_size], i // self._batch_size + 1, i
                 )
-                for j, text in enumerate(batch):
-                    try:
-                        emb = await self._request_embeddings([text])
-                        all_embeddings.extend(emb)
-                    except RuntimeError:
-                        logger.warning(
-                            "跳过超长文本 (index=%d, len=%d)", i + j, len(text)
-                        )
-                        all_embeddings.append(zero_vector)
-
-        return all_embeddings
+
+        tasks = [
+            asyncio.ensure_future(_run(i))
+            for i in range(0, len(texts), self._batch_size)
+        ]
+        try:
+            results = await asyncio.gather(*tasks)
+        except BaseException:
+            # 任一批次失败即整体失败，取消其余尚未完成的请求。
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            raise
+        return [embedding for batch in results for embedding in batch]
+
+    async def embed_batch(self, texts: list[str]) -> list[list[float]]:
+        """与 embed_texts 相同，但先按文本内容哈希查缓存，只对未命中的文本调用 API。"""
+        if self._cache is None:
+            return await self.embed_texts(texts)
+
+        keys = [text_cache_key(t, self._model_name) for t in texts]
+        cached = await asyncio.to_thread(self._cache.get_cached_embeddings, keys)
+
+        miss_texts: dict[str, str] = {}
+        hits = 0
+        for key, text in zip(keys, texts):
+            if key in cached:
+                hits += 1
+            else:
+                miss_texts.setdefault(key, text)
+
+        if miss_texts:
+            logger.info(
+                "Embedding 缓存命中 %d/%d，需请求 %d 条", hits, len(texts), len(miss_texts)
+            )
+            fresh = await self.embed_texts(list(miss_texts.values()))
+            fresh_by_key = dict(zip(miss_texts.keys(), fresh))
+            cached.update(fresh_by_key)
+            # 超长降级得到的零向量不写入缓存，下次仍会重试。
+            to_store = {k: v for k, v in fresh_by_key.items() if any(v)}
+            await asyncio.to_thread(self._cache.add_cached_embeddings, to_store)
+
+        return [cached[key] for key in keys]
 
     async def embed_query(self, query: str) -> list[float]:
         results = await self._request_embeddings([query])
@@ -0,0 +1,54 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+from typing import TYPE_CHECKING, Optional
+
+if TYPE_CHECKING:
+    import aiohttp
+
+logger = logging.getLogger(__name__)
+
+_session: Optional[aiohttp.ClientSession] = None
+_session_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+async def get_session() -> aiohttp.ClientSession:
+    """返回进程内共享的 aiohttp 会话，CDP 探测、资源下载与 Embedding 请求共用连接池。
+
+    会话绑定创建它的事件循环，首次调用或事件循环变化时重新创建。
+    """
+    import aiohttp
+
+    global _session, _session_loop
+    loop = asyncio.get_running_loop()
+    if _session is not None and not _session.closed and _session_loop is loop:
+        return _session
+
+    _session = aiohttp.ClientSession(
+        connector=aiohttp.TCPConnector(
+            limit=100,
+            limit_per_host=10,
+            keepalive_timeout=60,
+            enable_cleanup_closed=True,
+        ),
+        timeout=aiohttp.ClientTimeout(total=60, connect=10),
+        trust_env=False,
+    )
+    _session_loop = loop
+    return _session
+
+
+async def close_session() -> None:
+    global _session, _session_loop
+    session, _session = _session, None
+    loop, _session_loop = _session_loop, None
+    if session is None or session.closed:
+        return
+    if loop is not asyncio.get_running_loop():
+        # 创建会话的事件循环已结束，连接无法在当前循环中优雅关闭，直接丢弃。
+        return
+    try:
+        await session.close()
+    except Exception as e:
+        logger.debug("关闭 HTTP 会话失败: %s", e)
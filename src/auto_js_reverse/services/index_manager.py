@@ -1,14 +1,16 @@
 from __future__ import annotations
 
 import logging
+import math
 import re
-import warnings
 from pathlib import Path
-from typing import Optional
+from typing import TYPE_CHECKING, Iterator, Optional, Union
 
-import lancedb
 import pyarrow as pa
 
+if TYPE_CHECKING:
+    import lancedb
+
 logger = logging.getLogger(__name__)
 
 FILE_INDEX_SCHEMA = pa.schema(
@@ -37,12 +39,89 @@ CODE_CHUNKS_SCHEMA = pa.schema(
     ]
 )
 
+EMBEDDING_CACHE_SCHEMA = pa.schema(
+    [
+        pa.field("text_hash", pa.utf8()),
+        pa.field("vector", pa.list_(pa.float32(), 1024)),
+    ]
+)
+
+# IN (...) 过滤条件单次最多携带的键数量，避免生成过长的 SQL。
+IN_FILTER_MAX_KEYS = 500
+
+# code_chunks 中除向量外的列：文本检索、列举与向量检索结果都只需这些列，
+# Lance 按列存储，不投影 vector 列即可跳过每行约 4KB 的读取。
+_NON_VECTOR_CHUNK_COLS = [name for name in CODE_CHUNKS_SCHEMA.names if name != "vector"]
+
+# 代码块达到该行数后为向量列建立 IVF-PQ 近似索引，此前全表暴力检索已足够快。
+VECTOR_INDEX_MIN_ROWS = 10_000
+
+# IVF 索引检索时探查的分区数，越大召回越高、耗时越长；无索引时该参数不生效。
+VECTOR_SEARCH_NPROBES = 20
+
+# 有索引时先按 PQ 近似距离取 limit 的这么多倍候选，再读取原始向量精确重排，
+# 弥补 PQ 量化带来的召回损失；无索引时该参数不生效。
+VECTOR_SEARCH_REFINE_FACTOR = 20
+
+# 每累计这么多次写入就对各表执行一次 optimize（合并小文件、清理旧版本、
+# 把新数据并入已有索引），与 LanceDB 建议的约 20 次修改操作一致。
+OPTIMIZE_EVERY_WRITES = 20
+
+ArrowData = Union[pa.Table, pa.RecordBatch]
+
+
+def _records_to_batch(records: list[dict], schema: pa.Schema) -> pa.RecordBatch:
+    """按 schema 逐列构造 RecordBatch，写入时无需 Lance 逐行转换和推断向量列类型。"""
+    columns = [
+        pa.array([record.get(field.name) for record in records], type=field.type)
+        for field in schema
+    ]
+    return pa.RecordBatch.from_arrays(columns, schema=schema)
+
+
+# Python re 标志与 Lance（Rust regex）内联标志的对应关系；带有其他标志的正则不下推。
+_INLINE_REGEX_FLAGS = (
+    (re.IGNORECASE, "i"),
+    (re.MULTILINE, "m"),
+    (re.DOTALL, "s"),
+    (re.VERBOSE, "x"),
+)
+
+
+def _inline_regex_flags(flags: int) -> Optional[str]:
+    """把 re 标志转换为 (?ims) 形式的内联前缀，含无法对应的标志时返回 None。"""
+    letters = ""
+    for flag, letter in _INLINE_REGEX_FLAGS:
+        if flags & flag:
+            letters += letter
+            flags &= ~flag
+    if flags & ~re.UNICODE:
+        return None
+    return f"(?{letters})" if letters else ""
+
+
+def _resolve_local_path(path: str) -> str:
+    return str(Path(path).expanduser().resolve(strict=False))
+
 
 class IndexManager:
-    def __init__(self, db_dir: str):
+    def __init__(self, db_dir: str, nprobes: int = VECTOR_SEARCH_NPROBES):
+        # lancedb 导入耗时接近 1 秒，推迟到真正需要索引时再加载。
+        import lancedb
+
         self._db = lancedb.connect(db_dir)
         self._file_index: Optional[lancedb.table.Table] = None
         self._code_chunks: Optional[lancedb.table.Table] = None
+        self._embedding_cache: Optional[lancedb.table.Table] = None
+        # domain -> 文件记录的内存快照，首次列举时整表扫描一次，之后随写入增量维护。
+        self._files_by_domain: Optional[dict[str, list[dict]]] = None
+        # 规范化后的 local_path -> 文件记录，按路径反查时只需解析一次全部路径。
+        self._files_by_path: Optional[dict[str, dict]] = None
+        # url -> 文件记录（同一 URL 多次归档时保留最早的一条，与按 url 查询 limit(1) 一致）。
+        self._files_by_url: Optional[dict[str, dict]] = None
+        self._vector_index_ready = False
+        self._nprobes = max(1, nprobes)
+        self._writes_since_optimize = 0
         self._ensure_tables()
 
     def _ensure_tables(self) -> None:
@@ -64,6 +143,14 @@ class IndexManager:
                 schema=CODE_CHUNKS_SCHEMA,
             )
 
+        if "embedding_cache" in existing:
+            self._embedding_cache = self._db.open_table("embedding_cache")
+        else:
+            self._embedding_cache = self._db.create_table(
+                "embedding_cache",
+                schema=EMBEDDING_CACHE_SCHEMA,
+            )
+
     @staticmethod
     def _quote_filter_value(value: str) -> str:
         # DataFusion SQL 字符串字面量需要把单引号转义成两个单引号。
@@ -72,27 +159,157 @@ class IndexManager:
     def _eq_filter(self, field: str, value: str) -> str:
         return f"{field} = {self._quote_filter_value(value)}"
 
-    def hash_exists(self, url: str, file_hash: str) -> bool:
+    def _select_hash_pairs(self, expr: str) -> set[tuple[str, str]]:
+        table = (
+            self._file_index.search()
+            .where(expr)
+            .select(["url", "hash"])
+            .limit(None)
+            .to_arrow()
+        )
+        return set(zip(table.column("url").to_pylist(), table.column("hash").to_pylist()))
+
+    def existing_hashes_for_urls(
+        self, urls: list[str], domain: str
+    ) -> set[tuple[str, str]]:
+        """只取回给定 URL 已索引的 (url, hash)，历史文件很多的域名也只扫描命中的行。"""
+        unique = list(dict.fromkeys(u for u in urls if u))
+        if not unique:
+            return set()
         try:
-            expr = f"{self._eq_filter('url', url)} AND {self._eq_filter('hash', file_hash)}"
-            results = (
-                self._file_index.search()
-                .where(expr)
-                .limit(1)
-                .to_list()
-            )
-            return len(results) > 0
+            if self.get_file_count() == 0:
+                return set()
+            domain_expr = self._eq_filter("domain", domain)
+            pairs: set[tuple[str, str]] = set()
+            for i in range(0, len(unique), IN_FILTER_MAX_KEYS):
+                batch = unique[i : i + IN_FILTER_MAX_KEYS]
+                expr = f"{domain_expr} AND url IN (" + ", ".join(
+                    self._quote_filter_value(u) for u in batch
+                ) + ")"
+                pairs |= self._select_hash_pairs(expr)
+            return pairs
         except Exception as e:
-            logger.debug("hash_exists 查询失败 (url=%s): %s", url, e)
-            return False
+            logger.debug("existing_hashes_for_urls 查询失败 (domain=%s): %s", domain, e)
+            return set()
 
     def add_file_record(self, record: dict) -> None:
-        self._file_index.add([record])
+        self.add_file_records([record])
+
+    def add_file_records(self, records: list[dict]) -> None:
+        """一次提交写入多条文件记录，整批只产生一个 Lance 数据片段。"""
+        if not records:
+            return
+        self._file_index.add(_records_to_batch(records, FILE_INDEX_SCHEMA))
+        self._writes_since_optimize += 1
+        if self._files_by_domain is not None:
+            for record in records:
+                self._files_by_domain.setdefault(record.get("domain", ""), []).append(
+                    dict(record)
+                )
+        if self._files_by_path is not None:
+            self._index_local_paths(records)
+        if self._files_by_url is not None:
+            self._index_urls(records)
 
-    def add_code_chunks(self, chunks: list[dict]) -> None:
-        if not chunks:
+    def add_code_chunks(self, chunks: Union[list[dict], ArrowData]) -> None:
+        if not len(chunks):
             return
+        if isinstance(chunks, list):
+            chunks = _records_to_batch(chunks, CODE_CHUNKS_SCHEMA)
         self._code_chunks.add(chunks)
+        self._writes_since_optimize += 1
+
+    def get_cached_embeddings(self, text_hashes: list[str]) -> dict[str, list[float]]:
+        unique = list(dict.fromkeys(text_hashes))
+        cached: dict[str, list[float]] = {}
+        for i in range(0, len(unique), IN_FILTER_MAX_KEYS):
+            batch = unique[i : i + IN_FILTER_MAX_KEYS]
+            expr = "text_hash IN (" + ", ".join(
+                self._quote_filter_value(h) for h in batch
+            ) + ")"
+            try:
+                rows = (
+                    self._embedding_cache.search()
+                    .where(expr)
+                    .limit(len(batch))
+                    .to_list()
+                )
+            except Exception as e:
+                logger.debug("embedding 缓存查询失败: %s", e)
+                continue
+            for row in rows:
+                cached[row["text_hash"]] = row["vector"]
+        return cached
+
+    def add_cached_embeddings(self, entries: dict[str, list[float]]) -> None:
+        if not entries:
+            return
+        self._embedding_cache.add(
+            pa.RecordBatch.from_arrays(
+                [
+                    pa.array(list(entries.keys()), type=pa.utf8()),
+                    pa.array(
+                        list(entries.values()),
+                        type=EMBEDDING_CACHE_SCHEMA.field("vector").type,
+                    ),
+                ],
+                schema=EMBEDDING_CACHE_SCHEMA,
+            )
+        )
+        self._writes_since_optimize += 1
+
+    def maybe_optimize(self, threshold: int = OPTIMIZE_EVERY_WRITES) -> bool:
+        """写入次数累计达到 threshold 时整理各表的数据文件与索引，返回是否执行。"""
+        if self._writes_since_optimize < threshold:
+            return False
+        self._writes_since_optimize = 0
+        for table in (self._file_index, self._code_chunks, self._embedding_cache):
+            try:
+                table.optimize()
+            except Exception as e:
+                logger.warning("LanceDB 表整理失败: %s", e)
+        return True
+
+    def _has_vector_index(self) -> bool:
+        for index in self._code_chunks.list_indices():
+            if "vector" in getattr(index, "columns", ()):
+                return True
+        return False
+
+    def ensure_vector_index(
+        self,
+        min_rows: int = VECTOR_INDEX_MIN_ROWS,
+        num_partitions: Optional[int] = None,
+        num_sub_vectors: int = 64,
+    ) -> bool:
+        """代码块数量达到 min_rows 后为向量列建立余弦 IVF-PQ 索引，返回索引是否就绪。
+
+        未指定 num_partitions 时按行数的平方根划分 IVF 分区，使每个分区的行数与分区数相当。
+        """
+        if self._vector_index_ready:
+            return True
+        try:
+            if self._has_vector_index():
+                self._vector_index_ready = True
+                return True
+            total = self.get_chunk_count()
+            if total < min_rows:
+                return False
+            if num_partitions is None:
+                num_partitions = max(1, math.isqrt(total))
+            self._code_chunks.create_index(
+                metric="cosine",
+                vector_column_name="vector",
+                num_partitions=num_partitions,
+                num_sub_vectors=num_sub_vectors,
+                index_type="IVF_PQ",
+            )
+            self._vector_index_ready = True
+            logger.info("已为 code_chunks 建立 IVF-PQ 向量索引")
+            return True
+        except Exception as e:
+            logger.warning("建立向量索引失败，继续使用暴力检索: %s", e)
+            return False
 
     def search_vectors(
         self,
@@ -100,7 +317,14 @@ class IndexManager:
         limit: int = 10,
         domain_filter: Optional[str] = None,
     ) -> list[dict]:
-        search = self._code_chunks.search(query_vector).metric("cosine").limit(limit)
+        search = (
+            self._code_chunks.search(query_vector)
+            .metric("cosine")
+            .nprobes(self._nprobes)
+            .refine_factor(VECTOR_SEARCH_REFINE_FACTOR)
+            .select(_NON_VECTOR_CHUNK_COLS)
+            .limit(limit)
+        )
         if domain_filter:
             search = search.where(self._eq_filter("domain", domain_filter))
         return search.to_list()
@@ -115,32 +339,72 @@ class IndexManager:
             query = query.where(self._eq_filter("domain", domain))
         return query.limit(total).to_list()
 
-    def _list_chunk_records(self, domain: Optional[str] = None) -> list[dict]:
+    def _iter_chunk_batches(
+        self, domain: Optional[str] = None
+    ) -> Iterator[pa.RecordBatch]:
         total = self.get_chunk_count()
         if total == 0:
-            return []
+            return
 
-        query = self._code_chunks.search()
+        query = self._code_chunks.search().select(_NON_VECTOR_CHUNK_COLS)
         if domain:
             query = query.where(self._eq_filter("domain", domain))
-        return query.limit(total).to_list()
+        yield from query.limit(total).to_batches()
+
+    def iter_chunks(self, domain: Optional[str] = None) -> Iterator[dict]:
+        """按批次流式遍历代码块（不含 vector 列），供全量文本扫描使用。"""
+        for batch in self._iter_chunk_batches(domain):
+            yield from batch.to_pylist()
+
+    def _file_records_by_domain(self) -> dict[str, list[dict]]:
+        if self._files_by_domain is None:
+            grouped: dict[str, list[dict]] = {}
+            for record in self._list_file_records():
+                grouped.setdefault(record.get("domain", ""), []).append(record)
+            self._files_by_domain = grouped
+        return self._files_by_domain
+
+    def _aggregate_domains(self) -> list[dict]:
+        # 尚未建立内存快照时只投影 domain/timestamp 两列，在 Arrow 上分组聚合，
+        # 不必把整表记录转换成 Python 字典。
+        if self.get_file_count() == 0:
+            return []
+        table = (
+            self._file_index.search()
+            .select(["domain", "timestamp"])
+            .limit(None)
+            .to_arrow()
+        )
+        grouped = table.group_by("domain").aggregate(
+            [("domain", "count"), ("timestamp", "max")]
+        )
+        return [
+            {"domain": domain, "file_count": count, "latest": latest or ""}
+            for domain, count, latest in zip(
+                grouped.column("domain").to_pylist(),
+                grouped.column("domain_count").to_pylist(),
+                grouped.column("timestamp_max").to_pylist(),
+            )
+            if domain
+        ]
 
     def list_domains(self) -> list[dict]:
         try:
-            grouped: dict[str, dict[str, str | int]] = {}
-            for record in self._list_file_records():
-                domain = record.get("domain", "")
+            if self._files_by_domain is None:
+                return self._aggregate_domains()
+            domains = []
+            for domain, records in self._files_by_domain.items():
                 if not domain:
                     continue
-                current = grouped.setdefault(
-                    domain,
-                    {"domain": domain, "file_count": 0, "latest": ""},
+                latest = ""
+                for record in records:
+                    timestamp = record.get("timestamp", "")
+                    if isinstance(timestamp, str) and timestamp > latest:
+                        latest = timestamp
+                domains.append(
+                    {"domain": domain, "file_count": len(records), "latest": latest}
                 )
-                current["file_count"] = int(current["file_count"]) + 1
-                timestamp = record.get("timestamp", "")
-                if isinstance(timestamp, str) and timestamp > str(current["latest"]):
-                    current["latest"] = timestamp
-            return list(grouped.values())
+            return domains
         except Exception:
             return []
 
@@ -161,21 +425,34 @@ class IndexManager:
             expr = self._eq_filter("domain", domain)
             self._file_index.delete(expr)
             self._code_chunks.delete(expr)
+            self._writes_since_optimize += 2
+            if self._files_by_domain is not None:
+                self._files_by_domain.pop(domain, None)
+            self._files_by_path = None
+            self._files_by_url = None
         except Exception as e:
             logger.warning("删除域名 %s 数据失败: %s", domain, e)
 
     def list_files_by_domain(self, domain: Optional[str] = None) -> list[dict]:
         try:
-            return self._list_file_records(domain=domain)
+            grouped = self._file_records_by_domain()
+            # 返回副本，调用方修改记录不会污染内存快照。
+            if domain:
+                return [dict(record) for record in grouped.get(domain, ())]
+            return [dict(record) for records in grouped.values() for record in records]
         except Exception:
             return []
 
     def get_file_by_url(self, url: str) -> Optional[dict]:
         try:
-            results = self._file_index.search().where(
-                self._eq_filter("url", url)
-            ).limit(1).to_list()
-            return results[0] if results else None
+            if self._files_by_url is None:
+                # 首次按 URL 查找时由文件记录快照一次性建立映射，之后只是字典查找。
+                grouped = self._file_records_by_domain()
+                self._files_by_url = {}
+                for records in grouped.values():
+                    self._index_urls(records)
+            record = self._files_by_url.get(url)
+            return dict(record) if record is not None else None
         except Exception as e:
             logger.debug("get_file_by_url 查询失败 (url=%s): %s", url, e)
             return None
@@ -188,39 +465,85 @@ class IndexManager:
             if results:
                 return results[0]
 
-            target = Path(local_path).expanduser().resolve(strict=False)
-            for record in self.list_files_by_domain():
-                candidate = record.get("local_path", "")
-                if not candidate:
-                    continue
-                try:
-                    if (
-                        Path(candidate).expanduser().resolve(strict=False)
-                        == target
-                    ):
-                        return record
-                except Exception:
-                    continue
-            return None
+            if self._files_by_path is None:
+                grouped = self._file_records_by_domain()
+                self._files_by_path = {}
+                for records in grouped.values():
+                    self._index_local_paths(records)
+            record = self._files_by_path.get(_resolve_local_path(local_path))
+            return dict(record) if record is not None else None
         except Exception as e:
             logger.debug("get_file_by_local_path 查询失败 (path=%s): %s", local_path, e)
             return None
 
+    def _index_urls(self, records: list[dict]) -> None:
+        for record in records:
+            url = record.get("url")
+            if url:
+                self._files_by_url.setdefault(url, dict(record))
+
+    def _index_local_paths(self, records: list[dict]) -> None:
+        for record in records:
+            candidate = record.get("local_path", "")
+            if not candidate:
+                continue
+            try:
+                key = _resolve_local_path(candidate)
+            except Exception:
+                continue
+            # 与逐条扫描时一致，同一路径保留最先出现的记录。
+            self._files_by_path.setdefault(key, dict(record))
+
+    def _search_chunks_in_scan(
+        self, regex: re.Pattern[str], domain: Optional[str], limit: int
+    ) -> Optional[list[dict]]:
+        # 正则作为过滤条件下推给 Lance：扫描时先只读 text 列求值，命中行才读取其余列，
+        # 凑够 limit 条即停止扫描。标志无法对应时返回 None，
+        # Rust regex 不支持的语法（如前瞻、反向引用）会在这里抛错，均由调用方回退。
+        prefix = _inline_regex_flags(regex.flags)
+        if prefix is None:
+            return None
+        pattern = self._quote_filter_value(prefix + regex.pattern)
+        expr = f"regexp_like(text, {pattern})"
+        if domain:
+            expr = f"{self._eq_filter('domain', domain)} AND {expr}"
+        return (
+            self._code_chunks.search()
+            .where(expr)
+            .select(_NON_VECTOR_CHUNK_COLS)
+            .limit(limit)
+            .to_list()
+        )
+
     def search_chunks_by_text(
-        self, pattern: str, domain: Optional[str] = None, limit: int = 50
+        self,
+        pattern: Union[str, re.Pattern[str]],
+        domain: Optional[str] = None,
+        limit: int = 50,
     ) -> list[dict]:
         try:
-            records = self._list_chunk_records(domain=domain)
-            if not records:
-                return []
-            regex = re.compile(pattern, flags=re.IGNORECASE)
-            with warnings.catch_warnings():
-                warnings.simplefilter("ignore", UserWarning)
-                matched = [
-                    {k: v for k, v in record.items() if k != "vector"}
-                    for record in records
-                    if regex.search(str(record.get("text", "")))
+            # 传入已编译的正则时直接复用，并沿用其自身的标志；字符串模式默认忽略大小写。
+            if isinstance(pattern, re.Pattern):
+                regex = pattern
+            else:
+                regex = re.compile(pattern, flags=re.IGNORECASE)
+            try:
+                result = self._search_chunks_in_scan(regex, domain, limit)
+                if result is not None:
+                    return result
+            except Exception as e:
+                logger.debug("正则无法下推到 Lance 扫描，改为逐批过滤: %s", e)
+            # 回退到 Python re：逐批只取 text 列匹配，命中行才转换成字典。
+            matched: list[dict] = []
+            for batch in self._iter_chunk_batches(domain):
+                texts = batch.column("text").to_pylist()
+                hits = [
+                    i for i, text in enumerate(texts) if text and regex.search(text)
                 ]
+                if hits:
+                    matched.extend(batch.take(hits).to_pylist())
+                if len(matched) >= limit:
+                    break
             return matched[:limit]
         except Exception:
             return []
@@ -3,13 +3,38 @@ from __future__ import annotations
 import asyncio
 import json
 import logging
+import os
 import shutil
+import struct
 import subprocess
 from pathlib import Path
 from typing import Any, Optional
 
+try:
+    import orjson
+except ImportError:  # 可选加速依赖，未安装时回退到标准库 json
+    orjson = None
+
 logger = logging.getLogger(__name__)
 
+# 与 Worker 之间按帧通信：4 字节大端正文长度 + UTF-8 JSON 正文。
+_FRAME_HEADER = struct.Struct(">I")
+
+# 未配置进程数时 Worker 池的上限；每个进程各占一份 V8 堆，不宜按核数无限扩张。
+DEFAULT_POOL_SIZE = 4
+
+
+def _encode_payload(payload: dict[str, Any]) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(payload)
+    return json.dumps(payload, ensure_ascii=False).encode("utf-8")
+
+
+def _decode_payload(data: bytes) -> Any:
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
 
 class NodeBridge:
     def __init__(self, worker_script: str, max_old_space_size_mb: int = 256):
@@ -68,16 +93,14 @@ class NodeBridge:
         if not self._process or self._process.returncode is not None:
             await self.start()
 
-        line = json.dumps(payload, ensure_ascii=False) + "\n"
-        self._process.stdin.write(line.encode("utf-8"))
+        data = _encode_payload(payload)
+        self._process.stdin.write(_FRAME_HEADER.pack(len(data)))
+        self._process.stdin.write(data)
         await self._process.stdin.drain()
 
-        raw_line = await asyncio.wait_for(
-            self._process.stdout.readline(),
-            timeout=120.0,
-        )
-
-        if not raw_line:
+        try:
+            body = await asyncio.wait_for(self._read_frame(), timeout=120.0)
+        except asyncio.IncompleteReadError:
             stderr_output = ""
             if self._process.stderr:
                 try:
@@ -90,7 +113,13 @@ class NodeBridge:
                     pass
             raise RuntimeError(f"Node.js Worker 无响应。stderr: {stderr_output}")
 
-        return json.loads(raw_line.decode("utf-8"))
+        return _decode_payload(body)
+
+    async def _read_frame(self) -> bytes:
+        stdout = self._process.stdout
+        header = await stdout.readexactly(_FRAME_HEADER.size)
+        (size,) = _FRAME_HEADER.unpack(header)
+        return await stdout.readexactly(size)
 
     async def parse_files(self, files: list[dict[str, str]]) -> dict[str, Any]:
         async with self._lock:
@@ -102,3 +131,62 @@ class NodeBridge:
 
     async def __aexit__(self, *exc: Any) -> None:
         await self.stop()
+
+
+class NodeWorkerPool:
+    """多个 Node Worker 进程组成的解析池。
+
+    每个进程各有一个 NodeBridge（各自的管道与锁），parse_files 把文件
+    切分给各进程并行解析，再按原顺序合并结果。
+    """
+
+    def __init__(
+        self,
+        worker_script: str,
+        max_old_space_size_mb: int = 256,
+        size: Optional[int] = None,
+    ):
+        if not size:
+            size = min(os.cpu_count() or 1, DEFAULT_POOL_SIZE)
+        self._workers = [
+            NodeBridge(worker_script, max_old_space_size_mb=max_old_space_size_mb)
+            for _ in range(max(1, size))
+        ]
+
+    @property
+    def size(self) -> int:
+        return len(self._workers)
+
+    async def start(self) -> None:
+        await asyncio.gather(*(worker.start() for worker in self._workers))
+
+    async def stop(self) -> None:
+        await asyncio.gather(*(worker.stop() for worker in self._workers))
+
+    async def parse_files(self, files: list[dict[str, str]]) -> dict[str, Any]:
+        count = min(len(self._workers), len(files))
+        if count <= 1:
+            return await self._workers[0].parse_files(files)
+
+        step = -(-len(files) // count)
+        slices = [files[i : i + step] for i in range(0, len(files), step)]
+        responses = await asyncio.gather(
+            *(
+                worker.parse_files(part)
+                for worker, part in zip(self._workers, slices)
+            )
+        )
+
+        results: list[Any] = []
+        for response in responses:
+            if response.get("status") != "success":
+                return response
+            results.extend(response.get("results", []))
+        return {"status": "success", "results": results}
+
+    async def __aenter__(self) -> NodeWorkerPool:
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc: Any) -> None:
+        await self.stop()
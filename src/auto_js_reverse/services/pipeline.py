@@ -3,19 +3,40 @@ from __future__ import annotations
 import asyncio
 import json
 import logging
+from collections import deque
 from datetime import datetime, timezone
 from pathlib import Path
-from typing import Any, Optional
+from typing import TYPE_CHECKING, Any, Optional
 from urllib.parse import urlparse
 
+import pyarrow as pa
+
 from .browser_connector import BrowserConnector
-from .embedding_service import EmbeddingService
-from .index_manager import IndexManager
-from .node_bridge import NodeBridge
+from .http_client import close_session
+from .index_manager import (
+    CODE_CHUNKS_SCHEMA,
+    VECTOR_INDEX_MIN_ROWS,
+    VECTOR_SEARCH_NPROBES,
+    IndexManager,
+)
+from .node_bridge import NodeWorkerPool
+from .semantic_cache import SemanticCache
+
+if TYPE_CHECKING:
+    from .embedding_service import EmbeddingService
 
 logger = logging.getLogger(__name__)
 
 
+# 同时处于向量化/写库阶段的文件组上限，限制大批量抓取时驻留内存的向量数。
+MAX_PENDING_STORE_GROUPS = 2
+
+
+def _write_file(path: Path, data: bytes | bytearray) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(data)
+
+
 class Pipeline:
     def __init__(self, config: dict[str, Any], base_dir: Path):
         self._config = config
@@ -23,6 +44,12 @@ class Pipeline:
         storage_cfg = config.get("storage", {})
         self._storage_dir = base_dir / storage_cfg.get("base_dir", "storage/archives")
         self._db_dir = str(base_dir / storage_cfg.get("db_dir", "storage/db"))
+        self._vector_index_min_rows = storage_cfg.get(
+            "vector_index_min_rows", VECTOR_INDEX_MIN_ROWS
+        )
+        self._vector_search_nprobes = storage_cfg.get(
+            "vector_search_nprobes", VECTOR_SEARCH_NPROBES
+        )
 
         cdp_cfg = config.get("chrome_cdp", {})
         chrome_data_dir = cdp_cfg.get("user_data_dir")
@@ -45,9 +72,10 @@ class Pipeline:
                 "script_path", "src/auto_js_reverse/node_worker/processor.js"
             )
         )
-        self._node_bridge = NodeBridge(
+        self._node_bridge = NodeWorkerPool(
             worker_script=worker_script,
             max_old_space_size_mb=node_cfg.get("max_old_space_size_mb", 256),
+            size=node_cfg.get("pool_size"),
         )
 
         emb_cfg = config.get("embedding", {})
@@ -56,25 +84,41 @@ class Pipeline:
             "batch_size": emb_cfg.get("batch_size", 32),
             "api_key": emb_cfg.get("api_key"),
             "api_url": emb_cfg.get("api_url"),
+            "max_concurrency": emb_cfg.get("max_concurrency", 8),
         }
+        self._embedding_cache_enabled = emb_cfg.get("cache_enabled", True)
         self._embedding: Optional[EmbeddingService] = None
         self._embedding_error: Optional[str] = None
 
-        self._index = IndexManager(self._db_dir)
+        # LanceDB 连接与 Embedding 服务（aiohttp）均在首次使用时才初始化，
+        # execute_js / hook_function 等只用浏览器的工具不必承担这部分启动开销。
+        self._index: Optional[IndexManager] = None
+        self._search_cache = SemanticCache.from_config(config.get("search_cache", {}))
 
         pipeline_cfg = config.get("pipeline", {})
         self._max_concurrent = pipeline_cfg.get("max_concurrent_downloads", 5)
         self._max_file_size = pipeline_cfg.get("max_file_size_bytes", 5 * 1024 * 1024)
+        self._parse_group_size = max(1, pipeline_cfg.get("parse_group_size", 16))
+        self._guess_source_map = pipeline_cfg.get("guess_source_map_url", False)
 
     @property
     def index(self) -> IndexManager:
+        if self._index is None:
+            self._index = IndexManager(
+                self._db_dir, nprobes=self._vector_search_nprobes
+            )
         return self._index
 
     @property
     def embedding(self) -> EmbeddingService:
         if self._embedding is None:
             try:
-                self._embedding = EmbeddingService(**self._embedding_config)
+                from .embedding_service import EmbeddingService
+
+                self._embedding = EmbeddingService(
+                    **self._embedding_config,
+                    cache=self.index if self._embedding_cache_enabled else None,
+                )
                 self._embedding_error = None
             except Exception as e:
                 self._embedding_error = str(e)
@@ -118,6 +162,8 @@ class Pipeline:
             current_url = await self._browser.get_current_url()
             domain = BrowserConnector.extract_domain(current_url)
             captured_at = datetime.now(timezone.utc)
+            # 同一次抓取的文件记录与 metadata 共用抓取时刻，只格式化一次。
+            captured_ts = captured_at.isoformat()
 
             if storage_path:
                 base_storage = Path(storage_path)
@@ -127,12 +173,13 @@ class Pipeline:
             session_dir = self._build_session_dir(base_storage, domain, captured_at)
 
             html = await self._browser.get_document_html()
-            (session_dir / "index.html").write_text(html, encoding="utf-8")
+            await asyncio.to_thread(
+                (session_dir / "index.html").write_text, html, encoding="utf-8"
+            )
 
             scripts = await self._browser.get_all_scripts()
             logger.info("发现 %d 个脚本标签 (域名: %s)", len(scripts), domain)
 
-            semaphore = asyncio.Semaphore(self._max_concurrent)
             stats = {
                 "new_files": 0,
                 "skipped": 0,
@@ -143,6 +190,16 @@ class Pipeline:
             }
 
             tasks_to_parse: list[dict[str, str]] = []
+            # 页面脚本已索引的 (url, hash) 一次取回，逐个脚本去重只做集合查找。
+            known_hashes: set[tuple[str, str]] = (
+                set()
+                if force_refresh
+                else self.index.existing_hashes_for_urls(
+                    [s.get("src", "") for s in scripts], domain
+                )
+            )
+            # 文件记录在所有脚本处理完后一次性写入，避免每个脚本产生一个 Lance 小文件。
+            file_records: list[dict] = []
 
             def _url_to_local_path(src_url: str) -> Path:
                 parsed = urlparse(src_url)
@@ -174,59 +231,82 @@ class Pipeline:
                 if not src_url:
                     return
 
-                async with semaphore:
-                    content = await self._browser.download_resource(src_url)
-                    if not content:
-                        return
-
-                    file_hash = BrowserConnector.compute_hash(content)
-
-                    if not force_refresh and self._index.hash_exists(src_url, file_hash):
-                        stats["skipped"] += 1
-                        logger.debug("跳过已索引文件: %s", src_url)
-                        return
-
-                    if len(content) > self._max_file_size:
-                        logger.warning(
-                            "超大文件 (%d bytes), 将使用行切分: %s", len(content), src_url
-                        )
+                headers: dict[str, str] = {}
+                downloaded = await self._browser.download_resource_hashed(
+                    src_url, headers=headers
+                )
+                if not downloaded or not downloaded[0]:
+                    return
+                content, file_hash = downloaded
 
-                    local_path = _url_to_local_path(src_url)
-                    local_path.parent.mkdir(parents=True, exist_ok=True)
-                    local_path.write_bytes(content)
+                if (src_url, file_hash) in known_hashes:
+                    stats["skipped"] += 1
+                    logger.debug("跳过已索引文件: %s", src_url)
+                    return
 
-                    map_path: Optional[str] = None
-                    map_url = src_url + ".map"
-                    map_content = await self._browser.download_resource(map_url)
-                    if map_content:
-                        map_local = local_path.with_suffix(".js.map")
-                        map_local.write_bytes(map_content)
-                        map_path = str(map_local)
-                        stats["source_maps"] += 1
-
-                    self._index.add_file_record(
-                        {
-                            "url": src_url,
-                            "hash": file_hash,
-                            "domain": domain,
-                            "local_path": str(local_path),
-                            "map_path": map_path or "",
-                            "source_map_restored": map_path is not None,
-                            "timestamp": datetime.now(timezone.utc).isoformat(),
-                        }
+                if len(content) > self._max_file_size:
+                    logger.warning(
+                        "超大文件 (%d bytes), 将使用行切分: %s", len(content), src_url
                     )
 
-                    tasks_to_parse.append(
-                        {
-                            "path": str(local_path),
-                            "mapPath": map_path or "",
-                            "url": src_url,
-                            "fileHash": file_hash,
-                        }
+                local_path = _url_to_local_path(src_url)
+                map_path: Optional[str] = None
+                # 只有脚本通过响应头或末尾注释声明了 Source Map 才去下载，
+                # 多数未发布 Source Map 的站点因此省掉一次必然 404 的请求。
+                map_url = BrowserConnector.find_source_map_url(
+                    src_url, content, headers
+                )
+                if map_url is None and self._guess_source_map:
+                    map_url = src_url + ".map"
+                # 脚本在线程中写盘，同时下载 Source Map，两者重叠执行；
+                # 写入不阻塞事件循环上其他脚本的下载。
+                write = asyncio.to_thread(_write_file, local_path, content)
+                if map_url:
+                    _, map_content = await asyncio.gather(
+                        write, self._browser.download_resource(map_url)
                     )
-                    stats["new_files"] += 1
-
-            await asyncio.gather(*[process_script(s) for s in scripts])
+                else:
+                    await write
+                    map_content = None
+                if map_content:
+                    map_local = local_path.with_suffix(".js.map")
+                    await asyncio.to_thread(map_local.write_bytes, map_content)
+                    map_path = str(map_local)
+                    stats["source_maps"] += 1
+
+                file_records.append(
+                    {
+                        "url": src_url,
+                        "hash": file_hash,
+                        "domain": domain,
+                        "local_path": str(local_path),
+                        "map_path": map_path or "",
+                        "source_map_restored": map_path is not None,
+                        "timestamp": captured_ts,
+                    }
+                )
+
+                tasks_to_parse.append(
+                    {
+                        "path": str(local_path),
+                        "mapPath": map_path or "",
+                        "url": src_url,
+                        "fileHash": file_hash,
+                    }
+                )
+                stats["new_files"] += 1
+
+            # 固定数量的 worker 轮流从同一迭代器取脚本，并发上限不变，
+            # 同时存活的协程数只与 max_concurrent_downloads 有关，与脚本数无关。
+            pending_scripts = iter(scripts)
+
+            async def download_worker() -> None:
+                for script_info in pending_scripts:
+                    await process_script(script_info)
+
+            workers = min(max(1, self._max_concurrent), len(scripts))
+            await asyncio.gather(*[download_worker() for _ in range(workers)])
+            self.index.add_file_records(file_records)
 
             if tasks_to_parse:
                 embedding_reason = self.get_embedding_unavailable_reason()
@@ -244,15 +324,18 @@ class Pipeline:
                         stats["indexing_warning"] = f"代码向量索引失败: {e}"
                         logger.exception("代码向量索引失败")
 
+            await asyncio.to_thread(self.index.maybe_optimize)
+
             metadata = {
                 "url": current_url,
                 "domain": domain,
-                "timestamp": captured_at.isoformat(),
+                "timestamp": captured_ts,
                 "storage_path": str(session_dir),
                 "stats": stats,
             }
 
-            (session_dir / "metadata.json").write_text(
+            await asyncio.to_thread(
+                (session_dir / "metadata.json").write_text,
                 json.dumps(metadata, ensure_ascii=False, indent=2),
                 encoding="utf-8",
             )
@@ -264,16 +347,16 @@ class Pipeline:
             except Exception as e:
                 logger.debug("capture_page 清理浏览器连接失败: %s", e)
 
-    async def _parse_and_index(self, files: list[dict[str, str]], domain: str) -> int:
-        await self._node_bridge.start()
-        result = await self._node_bridge.parse_files(files)
-
-        if result.get("status") != "success":
-            logger.error("Node.js 解析失败: %s", result.get("message", "unknown"))
-            return 0
-
-        all_texts: list[str] = []
-        all_metadata: list[dict] = []
+    @staticmethod
+    def _collect_chunk_columns(
+        result: dict[str, Any], files: list[dict[str, str]], domain: str
+    ) -> dict[str, list]:
+        # 代码块按列收集，向量返回后直接拼成 Arrow RecordBatch 写入，
+        # 不再为每个代码块构造一份包含向量的字典。
+        columns: dict[str, list] = {
+            name: [] for name in CODE_CHUNKS_SCHEMA.names if name != "vector"
+        }
+        texts = columns["text"]
         file_hash_by_url = {f["url"]: f.get("fileHash", "") for f in files}
 
         for file_result in result.get("results", []):
@@ -289,53 +372,104 @@ class Pipeline:
                     if not text or len(text) < 20:
                         continue
 
-                    all_texts.append(text)
-                    all_metadata.append(
-                        {
-                            "original_file": original_file,
-                            "url": url,
-                            "domain": domain,
-                            "line_start": chunk.get("lineStart", 0),
-                            "line_end": chunk.get("lineEnd", 0),
-                            "source_map_restored": is_restored,
-                            "file_hash": file_hash,
-                        }
+                    texts.append(text)
+                    columns["original_file"].append(original_file)
+                    columns["url"].append(url)
+                    columns["domain"].append(domain)
+                    columns["line_start"].append(chunk.get("lineStart", 0))
+                    columns["line_end"].append(chunk.get("lineEnd", 0))
+                    columns["source_map_restored"].append(is_restored)
+                    columns["file_hash"].append(file_hash)
+
+        return columns
+
+    async def _embed_and_store(self, columns: dict[str, list]) -> int:
+        columns["vector"] = await self._embedding.embed_batch(columns["text"])
+        batch = pa.RecordBatch.from_pydict(columns, schema=CODE_CHUNKS_SCHEMA)
+        self.index.add_code_chunks(batch)
+        return batch.num_rows
+
+    async def _parse_and_index(self, files: list[dict[str, str]], domain: str) -> int:
+        await self._node_bridge.start()
+
+        # 文件分组交给 Node 解析，每组解析完立即转入向量化与写库，
+        # 下一组的解析与上一组的 Embedding 请求并行进行。在途的组数有上限，
+        # Embedding 跟不上解析时暂停解析，内存中只保留少数几组的文本与向量。
+        store_tasks: deque[asyncio.Task] = deque()
+        indexed = 0
+        try:
+            for i in range(0, len(files), self._parse_group_size):
+                while len(store_tasks) >= MAX_PENDING_STORE_GROUPS:
+                    indexed += await store_tasks.popleft()
+
+                group = files[i : i + self._parse_group_size]
+                result = await self._node_bridge.parse_files(group)
+                if result.get("status") != "success":
+                    logger.error(
+                        "Node.js 解析失败: %s", result.get("message", "unknown")
                     )
+                    continue
 
-        if not all_texts:
-            return 0
+                columns = self._collect_chunk_columns(result, group, domain)
+                if columns["text"]:
+                    store_tasks.append(
+                        asyncio.create_task(self._embed_and_store(columns))
+                    )
 
-        embeddings = await self._embedding.embed_texts(all_texts)
-
-        db_records = []
-        for i, (text, meta, vector) in enumerate(
-            zip(all_texts, all_metadata, embeddings)
-        ):
-            db_records.append(
-                {
-                    "vector": vector,
-                    "text": text,
-                    **meta,
-                }
-            )
+            while store_tasks:
+                indexed += await store_tasks.popleft()
+        except BaseException:
+            for task in store_tasks:
+                task.cancel()
+            await asyncio.gather(*store_tasks, return_exceptions=True)
+            raise
 
-        self._index.add_code_chunks(db_records)
-        logger.info("成功索引 %d 个代码块", len(db_records))
-        return len(db_records)
+        if not indexed:
+            return 0
+
+        # 首次越过行数阈值时训练索引耗时数秒，放到线程中避免阻塞事件循环。
+        await asyncio.to_thread(
+            self.index.ensure_vector_index, self._vector_index_min_rows
+        )
+        if self._search_cache is not None:
+            self._search_cache.clear()
+        logger.info("成功索引 %d 个代码块", indexed)
+        return indexed
 
     async def search(
         self, query: str, domain_filter: Optional[str] = None, limit: int = 10
     ) -> list[dict]:
+        scope = (domain_filter, limit)
+        if self._search_cache is not None:
+            # 相同查询原文先于 Embedding 请求命中，省去一次远程 API 调用。
+            cached = self._search_cache.get_text(query, scope=scope)
+            if cached is not None:
+                logger.debug("检索缓存命中: %s", query)
+                return cached
+
         query_vector = await self.embedding.embed_query(query)
-        results = self._index.search_vectors(
+        if self._search_cache is not None:
+            cached = self._search_cache.get(query_vector, scope=scope)
+            if cached is not None:
+                logger.debug("语义缓存命中: %s", query)
+                return cached
+
+        results = self.index.search_vectors(
             query_vector, limit=limit, domain_filter=domain_filter
         )
+        if self._search_cache is not None:
+            self._search_cache.put(query_vector, results, scope=scope, text=query)
         return results
 
     async def shutdown(self) -> None:
         await self._node_bridge.stop()
+        try:
+            await self._browser.stop_collecting()
+        except Exception:
+            pass
         try:
             await self._browser.disconnect()
         except Exception:
             pass
-        self._browser.shutdown_chrome()
+        await self._browser.shutdown_chrome()
+        await close_session()
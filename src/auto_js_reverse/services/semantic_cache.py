@@ -0,0 +1,172 @@
+from __future__ import annotations
+
+import math
+import operator
+import random
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Hashable, Optional
+
+try:
+    from math import sumprod as _dot  # Python 3.12+，C 实现的点积
+except ImportError:
+
+    def _dot(a: list[float], b: list[float]) -> float:
+        return sum(map(operator.mul, a, b))
+
+
+@dataclass
+class _CacheEntry:
+    scope: Hashable
+    signature: int
+    vector: list[float]
+    results: list[dict]
+    expires_at: float
+    text: Optional[str] = None
+
+
+class SemanticCache:
+    """基于随机超平面 LSH 的检索结果缓存。
+
+    查询原文完全相同时由 get_text 直接命中，连查询向量都无需请求 Embedding API；
+    原文不同时，查询向量按 num_planes 个随机超平面的符号打包为整数签名，同签名桶内
+    余弦相似度不低于阈值的历史查询（近乎重复的查询）复用其检索结果，跳过向量检索。
+    """
+
+    def __init__(
+        self,
+        similarity_threshold: float = 0.99,
+        ttl_sec: float = 600.0,
+        max_entries: int = 256,
+        num_planes: int = 16,
+        seed: int = 0,
+    ):
+        self._threshold = similarity_threshold
+        self._ttl = ttl_sec
+        self._max_entries = max_entries
+        self._num_planes = num_planes
+        self._seed = seed
+        self._planes: list[list[float]] = []
+        self._buckets: dict[int, list[int]] = {}
+        self._entries: OrderedDict[int, _CacheEntry] = OrderedDict()
+        # (scope, 查询原文) -> 条目 id，精确命中时无需计算查询向量。
+        self._by_text: dict[tuple[Hashable, str], int] = {}
+        self._next_id = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @staticmethod
+    def _normalize(vector: list[float]) -> list[float]:
+        norm = math.hypot(*vector)
+        if norm == 0:
+            return list(vector)
+        return [x / norm for x in vector]
+
+    def _signature(self, vector: list[float]) -> int:
+        if len(self._planes) != self._num_planes or (
+            self._planes and len(self._planes[0]) != len(vector)
+        ):
+            # 超平面按向量维度惰性生成，固定种子保证同一进程内签名稳定。
+            rng = random.Random(self._seed)
+            self._planes = [
+                [rng.gauss(0.0, 1.0) for _ in vector] for _ in range(self._num_planes)
+            ]
+            self.clear()
+
+        bits = 0
+        for plane in self._planes:
+            bits = (bits << 1) | (_dot(plane, vector) > 0)
+        return bits
+
+    def _drop(self, entry_id: int) -> None:
+        entry = self._entries.pop(entry_id, None)
+        if entry is None:
+            return
+        if entry.text is not None:
+            key = (entry.scope, entry.text)
+            if self._by_text.get(key) == entry_id:
+                del self._by_text[key]
+        bucket = self._buckets.get(entry.signature)
+        if bucket is None:
+            return
+        bucket.remove(entry_id)
+        if not bucket:
+            del self._buckets[entry.signature]
+
+    def get_text(self, text: str, scope: Hashable = None) -> Optional[list[dict]]:
+        entry_id = self._by_text.get((scope, text))
+        if entry_id is None:
+            return None
+        entry = self._entries[entry_id]
+        if entry.expires_at <= time.monotonic():
+            self._drop(entry_id)
+            return None
+        self._entries.move_to_end(entry_id)
+        return list(entry.results)
+
+    def get(self, vector: list[float], scope: Hashable = None) -> Optional[list[dict]]:
+        unit = self._normalize([float(x) for x in vector])
+        signature = self._signature(unit)
+        now = time.monotonic()
+
+        for entry_id in list(self._buckets.get(signature, ())):
+            entry = self._entries[entry_id]
+            if entry.expires_at <= now:
+                self._drop(entry_id)
+                continue
+            if entry.scope != scope:
+                continue
+            similarity = _dot(entry.vector, unit)
+            if similarity >= self._threshold:
+                self._entries.move_to_end(entry_id)
+                return list(entry.results)
+        return None
+
+    def put(
+        self,
+        vector: list[float],
+        results: list[dict],
+        scope: Hashable = None,
+        text: Optional[str] = None,
+    ) -> None:
+        if self._max_entries <= 0:
+            return
+        unit = self._normalize([float(x) for x in vector])
+        signature = self._signature(unit)
+        if text is not None and (scope, text) in self._by_text:
+            self._drop(self._by_text[(scope, text)])
+
+        entry_id = self._next_id
+        self._next_id += 1
+        self._entries[entry_id] = _CacheEntry(
+            scope=scope,
+            signature=signature,
+            vector=unit,
+            results=list(results),
+            expires_at=time.monotonic() + self._ttl,
+            text=text,
+        )
+        self._buckets.setdefault(signature, []).append(entry_id)
+        if text is not None:
+            self._by_text[(scope, text)] = entry_id
+
+        while len(self._entries) > self._max_entries:
+            oldest_id = next(iter(self._entries))
+            self._drop(oldest_id)
+
+    def clear(self) -> None:
+        self._buckets.clear()
+        self._entries.clear()
+        self._by_text.clear()
+
+    @classmethod
+    def from_config(cls, cfg: dict[str, Any]) -> Optional[SemanticCache]:
+        if not cfg.get("enabled", True):
+            return None
+        return cls(
+            similarity_threshold=cfg.get("similarity_threshold", 0.99),
+            ttl_sec=cfg.get("ttl_sec", 600),
+            max_entries=cfg.get("max_entries", 256),
+        )
@@ -1,11 +1,14 @@
 from __future__ import annotations
 
 import asyncio
+import copy
 import json
 import logging
-import shutil
+import os
 import sys
 import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 from pathlib import Path
 
 import pytest
@@ -15,6 +18,7 @@ sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
 from auto_js_reverse.services.browser_connector import (
     BrowserConnector,
     _find_chrome_binary,
+    _json_loads,
 )
 from auto_js_reverse.services.node_bridge import NodeBridge
 from auto_js_reverse.services.index_manager import IndexManager
@@ -37,12 +41,18 @@ FAIL = "❌ FAIL"
 pytestmark = pytest.mark.e2e
 
 
-def load_config() -> dict:
+@lru_cache(maxsize=1)
+def _read_config() -> dict:
     if CONFIG_PATH.exists():
-        return json.loads(CONFIG_PATH.read_text(encoding="utf-8"))
+        return _json_loads(CONFIG_PATH.read_bytes())
     return {}
 
 
+def load_config() -> dict:
+    # 配置文件只读取解析一次；调用方会就地改写返回值，每次交出独立副本。
+    return copy.deepcopy(_read_config())
+
+
 def ensure_test_config(config: dict) -> dict:
     config.setdefault("chrome_cdp", {})
     config.setdefault("storage", {})
@@ -81,10 +91,11 @@ def test_node_worker() -> bool:
             f"空文件列表应返回 success, 实际: {result}"
         )
 
-        test_file = Path(tempfile.mktemp(suffix=".js"))
-        test_file.write_text(
-            "function hello() { return 'world'; }\nconst x = 1;", encoding="utf-8"
-        )
+        with tempfile.NamedTemporaryFile(
+            "w", suffix=".js", delete=False, encoding="utf-8"
+        ) as tmp:
+            tmp.write("function hello() { return 'world'; }\nconst x = 1;")
+        test_file = Path(tmp.name)
         try:
             result = await bridge.parse_files(
                 [
@@ -118,11 +129,13 @@ def test_embedding_service() -> bool:
     )
 
     async def _test():
-        vectors = await svc.embed_texts(["function login() { return token; }"])
+        # 两次请求互不依赖，并发发出，测试只承担一次网络往返。
+        vectors, query_vec = await asyncio.gather(
+            svc.embed_texts(["function login() { return token; }"]),
+            svc.embed_query("login function"),
+        )
         assert len(vectors) == 1, f"应返回 1 个向量, 实际: {len(vectors)}"
         assert len(vectors[0]) == 1024, f"向量维度应为 1024, 实际: {len(vectors[0])}"
-
-        query_vec = await svc.embed_query("login function")
         assert len(query_vec) == 1024
 
     asyncio.run(_test())
@@ -131,8 +144,9 @@ def test_embedding_service() -> bool:
 
 
 def test_index_manager() -> bool:
-    tmp_db = tempfile.mkdtemp(prefix="mcp_test_db_")
-    try:
+    with tempfile.TemporaryDirectory(
+        prefix="mcp_test_db_", ignore_cleanup_errors=True
+    ) as tmp_db:
         idx = IndexManager(tmp_db)
 
         assert idx.get_file_count() == 0
@@ -150,8 +164,10 @@ def test_index_manager() -> bool:
             }
         )
         assert idx.get_file_count() == 1
-        assert idx.hash_exists("https://test.com/app.js", "abc123")
-        assert not idx.hash_exists("https://test.com/app.js", "xyz789")
+        assert idx.existing_hashes_for_urls(["https://test.com/app.js"], "test.com") == {
+            ("https://test.com/app.js", "abc123")
+        }
+        assert not idx.existing_hashes_for_urls(["https://test.com/other.js"], "test.com")
 
         fake_vector = [0.1] * 1024
         idx.add_code_chunks(
@@ -180,8 +196,20 @@ def test_index_manager() -> bool:
 
         logger.info("%s IndexManager (CRUD + 哈希去重 + 向量检索)", PASS)
         return True
-    finally:
-        shutil.rmtree(tmp_db, ignore_errors=True)
+
+
+def _scan_js_files(root: Path) -> list[os.DirEntry]:
+    # 单次 scandir 遍历目录树，按文件名筛选；只对需要打印大小的条目调用 stat()。
+    found: list[os.DirEntry] = []
+    pending = [root]
+    while pending:
+        with os.scandir(pending.pop()) as it:
+            for entry in it:
+                if entry.is_dir(follow_symlinks=False):
+                    pending.append(entry.path)
+                elif entry.name.endswith(".js"):
+                    found.append(entry)
+    return found
 
 
 def test_full_pipeline_baidu() -> bool:
@@ -189,14 +217,7 @@ def test_full_pipeline_baidu() -> bool:
     config["chrome_cdp"]["auto_launch"] = True
     config["chrome_cdp"]["headless"] = True
 
-    tmp_storage = Path(tempfile.mkdtemp(prefix="mcp_test_storage_"))
-    tmp_db = tempfile.mkdtemp(prefix="mcp_test_pipeline_db_")
-    config["storage"]["db_dir"] = tmp_db
-
-    pipeline = Pipeline(config=config, base_dir=BASE_DIR)
-    pipeline._index = IndexManager(tmp_db)
-
-    async def _run():
+    async def _run(tmp_storage: Path, pipeline: Pipeline):
         stats = await pipeline.capture_page(
             force_refresh=True,
             storage_path=str(tmp_storage),
@@ -216,14 +237,14 @@ def test_full_pipeline_baidu() -> bool:
 
         metadata_file = storage_path / "metadata.json"
         assert metadata_file.exists(), "metadata.json 应存在"
-        metadata = json.loads(metadata_file.read_text(encoding="utf-8"))
+        metadata = _json_loads(metadata_file.read_bytes())
         assert "baidu" in metadata["domain"].lower()
 
-        js_files = list(storage_path.rglob("*.js"))
+        js_files = _scan_js_files(storage_path)
         logger.info("存储的 JS 文件数: %d", len(js_files))
-        for f in js_files[:5]:
-            rel = f.relative_to(storage_path)
-            logger.info("  - %s (%d bytes)", rel, f.stat().st_size)
+        for entry in js_files[:5]:
+            rel = os.path.relpath(entry.path, storage_path)
+            logger.info("  - %s (%d bytes)", rel, entry.stat().st_size)
 
         if stats["chunks_indexed"] > 0:
             results = await pipeline.search("百度搜索", domain_filter=None, limit=5)
@@ -233,42 +254,50 @@ def test_full_pipeline_baidu() -> bool:
         await pipeline.shutdown()
         return stats
 
-    try:
-        stats = asyncio.run(_run())
+    with tempfile.TemporaryDirectory(
+        prefix="mcp_test_storage_", ignore_cleanup_errors=True
+    ) as storage_dir, tempfile.TemporaryDirectory(
+        prefix="mcp_test_pipeline_db_", ignore_cleanup_errors=True
+    ) as tmp_db:
+        config["storage"]["db_dir"] = tmp_db
+        pipeline = Pipeline(config=config, base_dir=BASE_DIR)
+        pipeline._index = IndexManager(tmp_db)
+        try:
+            stats = asyncio.run(_run(Path(storage_dir), pipeline))
 
-        logger.info("%s 完整管线测试 (百度)", PASS)
-        logger.info("  - 新增文件: %d", stats["new_files"])
-        logger.info("  - Source Map: %d", stats["source_maps"])
-        logger.info("  - 索引代码块: %d", stats["chunks_indexed"])
-        logger.info("  - 存储路径: %s", stats["storage_path"])
-        return True
-    except Exception as e:
-        logger.exception("%s 完整管线测试失败: %s", FAIL, e)
-        return False
-    finally:
-        shutil.rmtree(tmp_storage, ignore_errors=True)
-        shutil.rmtree(tmp_db, ignore_errors=True)
+            logger.info("%s 完整管线测试 (百度)", PASS)
+            logger.info("  - 新增文件: %d", stats["new_files"])
+            logger.info("  - Source Map: %d", stats["source_maps"])
+            logger.info("  - 索引代码块: %d", stats["chunks_indexed"])
+            logger.info("  - 存储路径: %s", stats["storage_path"])
+            return True
+        except Exception as e:
+            logger.exception("%s 完整管线测试失败: %s", FAIL, e)
+            return False
 
 
 def main():
+    from auto_js_reverse.main import _install_uvloop
+
+    _install_uvloop()
+
     logger.info("=" * 60)
     logger.info("auto_js_reverse 端到端测试")
     logger.info("目标: %s", TARGET_URL)
     logger.info("=" * 60)
 
-    results: dict[str, bool] = {}
-
-    logger.info("\n--- 1/5 Chrome 浏览器检测 ---")
-    results["chrome_detection"] = test_chrome_detection()
-
-    logger.info("\n--- 2/5 Node.js Worker ---")
-    results["node_worker"] = test_node_worker()
-
-    logger.info("\n--- 3/5 Embedding Service ---")
-    results["embedding"] = test_embedding_service()
-
-    logger.info("\n--- 4/5 IndexManager ---")
-    results["index_manager"] = test_index_manager()
+    # 前四项互不共享状态，各自在线程里跑（需要事件循环的用例各自 asyncio.run），
+    # Node 进程启动、Embedding 请求与建库的等待时间相互重叠；完整管线独占 Chrome，仍串行执行。
+    prerequisites = {
+        "chrome_detection": test_chrome_detection,
+        "node_worker": test_node_worker,
+        "embedding": test_embedding_service,
+        "index_manager": test_index_manager,
+    }
+    logger.info("\n--- 1-4/5 Chrome / Node.js Worker / Embedding / IndexManager（并行） ---")
+    with ThreadPoolExecutor(max_workers=len(prerequisites)) as executor:
+        futures = {name: executor.submit(test) for name, test in prerequisites.items()}
+        results: dict[str, bool] = {name: future.result() for name, future in futures.items()}
 
     if all(results.values()):
         logger.info("\n--- 5/5 完整管线 (www.baidu.com) ---")
@@ -562,6 +562,10 @@ async def run_all_steps():
 
 
 def main():
+    from auto_js_reverse.main import _install_uvloop
+
+    _install_uvloop()
+
     logger.info("=" * 60)
     logger.info("fenbi.com 登录逆向 —— MCP 工具链集成测试")
     logger.info("目标: %s", TARGET_URL)
@@ -1,18 +1,23 @@
 from __future__ import annotations
 
 import asyncio
+import heapq
 import json
 import logging
-import shutil
+import math
+import operator
+import random
 import sys
 import tempfile
+from itertools import islice
 from pathlib import Path
+from typing import Any, Coroutine, Optional
 
 import pytest
 
 sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
 
-from auto_js_reverse.services.browser_connector import BrowserConnector
+from auto_js_reverse.services.browser_connector import BrowserConnector, _json_loads
 from auto_js_reverse.services.index_manager import IndexManager
 from auto_js_reverse.services.embedding_service import EmbeddingService
 from auto_js_reverse.services.pipeline import Pipeline
@@ -30,10 +35,16 @@ TARGET_URL = "https://www.baidu.com"
 PASS = "✅ PASS"
 FAIL = "❌ FAIL"
 
+# 各用例共用的占位向量，代码块只引用同一个列表，不再各自构造。
+FAKE_VECTOR = [0.1] * 1024
+
+# 每次 connect("memory://") 都是独立的内存库，用例之间互不影响，也无需建删临时目录。
+IN_MEMORY_DB = "memory://"
+
 
 def load_config() -> dict:
     if CONFIG_PATH.exists():
-        return json.loads(CONFIG_PATH.read_text(encoding="utf-8"))
+        return _json_loads(CONFIG_PATH.read_bytes())
     return {}
 
 
@@ -47,9 +58,10 @@ def ensure_test_config(config: dict) -> dict:
 @pytest.mark.unit
 def test_list_captured_files() -> bool:
     """测试 IndexManager.list_files_by_domain 和 get_file_by_url"""
-    tmp_db = tempfile.mkdtemp(prefix="mcp_test_list_")
-    try:
-        idx = IndexManager(tmp_db)
+    with tempfile.TemporaryDirectory(
+        prefix="mcp_test_list_", ignore_cleanup_errors=True
+    ) as tmp_dir:
+        idx = IndexManager(IN_MEMORY_DB)
 
         assert idx.list_files_by_domain() == [], "空库应返回空列表"
         assert idx.list_files_by_domain(domain="test.com") == []
@@ -87,112 +99,241 @@ def test_list_captured_files() -> bool:
         missing = idx.get_file_by_url("https://nonexist.com/x.js")
         assert missing is None
 
+        archived = Path(tmp_dir) / "archived.js"
+        archived.write_text("var a = 1;", encoding="utf-8")
+        idx.add_file_record({
+            "url": "https://test.com/archived.js",
+            "hash": "ghi789",
+            "domain": "test.com",
+            "local_path": str(archived),
+            "map_path": "",
+            "source_map_restored": False,
+            "timestamp": "2026-02-16T02:00:00Z",
+        })
+
+        class PipelineStub:
+            def __init__(self, index: IndexManager):
+                self.index = index
+
+        import auto_js_reverse.main as main_mod
+
+        original_pipeline = main_mod.pipeline
+        main_mod.pipeline = PipelineStub(idx)
+        try:
+            result = asyncio.run(main_mod.list_captured_files.fn(domain_filter="test.com"))
+        finally:
+            main_mod.pipeline = original_pipeline
+
+        assert "共 2 个" in result
+        assert f"`{archived}` (10 bytes)" in result
+        assert "`/tmp/app.js`\n" in result, "缺失的本地文件不应显示大小"
+
+        domains = {d["domain"]: d for d in idx.list_domains()}
+        assert domains["test.com"]["file_count"] == 2
+        assert domains["test.com"]["latest"] == "2026-02-16T02:00:00Z"
+
+        idx.delete_by_domain("test.com")
+        assert idx.list_files_by_domain(domain="test.com") == []
+        assert len(idx.list_files_by_domain()) == 1
+
         logger.info("%s list_captured_files (list_files_by_domain + get_file_by_url)", PASS)
         return True
-    finally:
-        shutil.rmtree(tmp_db, ignore_errors=True)
 
 
 @pytest.mark.unit
 def test_search_chunks_by_text() -> bool:
     """测试 IndexManager.search_chunks_by_text"""
-    tmp_db = tempfile.mkdtemp(prefix="mcp_test_search_text_")
-    try:
-        idx = IndexManager(tmp_db)
-
-        fake_vector = [0.1] * 1024
-        idx.add_code_chunks([
-            {
-                "vector": fake_vector,
-                "text": "function encrypt(data) { return CryptoJS.AES.encrypt(data, key); }",
-                "original_file": "crypto.js",
-                "url": "https://test.com/crypto.js",
-                "domain": "test.com",
-                "line_start": 1,
-                "line_end": 1,
-                "source_map_restored": False,
-                "file_hash": "abc",
-            },
-            {
-                "vector": fake_vector,
-                "text": "function login(user, pass) { return fetch('/api/login'); }",
-                "original_file": "auth.js",
-                "url": "https://test.com/auth.js",
-                "domain": "test.com",
-                "line_start": 10,
-                "line_end": 12,
-                "source_map_restored": False,
-                "file_hash": "def",
-            },
-            {
-                "vector": fake_vector,
-                "text": "var md5 = require('md5'); var hash = md5(input);",
-                "original_file": "hash.js",
-                "url": "https://other.com/hash.js",
-                "domain": "other.com",
-                "line_start": 1,
-                "line_end": 1,
-                "source_map_restored": False,
-                "file_hash": "ghi",
-            },
-        ])
-
-        results = idx.search_chunks_by_text(r"(?i)\bCryptoJS\b")
-        assert len(results) >= 1, f"应匹配 CryptoJS, 实际: {len(results)}"
-        assert "CryptoJS" in results[0]["text"]
-
-        results_domain = idx.search_chunks_by_text(r"(?i)\bmd5\b", domain="other.com")
-        assert len(results_domain) >= 1
-        assert results_domain[0]["domain"] == "other.com"
-
-        results_no = idx.search_chunks_by_text(r"nonexistent_pattern_xyz")
-        assert len(results_no) == 0
-
-        logger.info("%s search_chunks_by_text (正则匹配 + 域名过滤)", PASS)
-        return True
-    finally:
-        shutil.rmtree(tmp_db, ignore_errors=True)
+    idx = IndexManager(IN_MEMORY_DB)
+
+    idx.add_code_chunks([
+        {
+            "vector": FAKE_VECTOR,
+            "text": "function encrypt(data) { return CryptoJS.AES.encrypt(data, key); }",
+            "original_file": "crypto.js",
+            "url": "https://test.com/crypto.js",
+            "domain": "test.com",
+            "line_start": 1,
+            "line_end": 1,
+            "source_map_restored": False,
+            "file_hash": "abc",
+        },
+        {
+            "vector": FAKE_VECTOR,
+            "text": "function login(user, pass) { return fetch('/api/login'); }",
+            "original_file": "auth.js",
+            "url": "https://test.com/auth.js",
+            "domain": "test.com",
+            "line_start": 10,
+            "line_end": 12,
+            "source_map_restored": False,
+            "file_hash": "def",
+        },
+        {
+            "vector": FAKE_VECTOR,
+            "text": "var md5 = require('md5'); var hash = md5(input);",
+            "original_file": "hash.js",
+            "url": "https://other.com/hash.js",
+            "domain": "other.com",
+            "line_start": 1,
+            "line_end": 1,
+            "source_map_restored": False,
+            "file_hash": "ghi",
+        },
+    ])
+
+    results = idx.search_chunks_by_text(r"(?i)\bCryptoJS\b")
+    assert len(results) >= 1, f"应匹配 CryptoJS, 实际: {len(results)}"
+    assert "CryptoJS" in results[0]["text"]
+
+    results_domain = idx.search_chunks_by_text(r"(?i)\bmd5\b", domain="other.com")
+    assert len(results_domain) >= 1
+    assert results_domain[0]["domain"] == "other.com"
+
+    results_no = idx.search_chunks_by_text(r"nonexistent_pattern_xyz")
+    assert len(results_no) == 0
+
+    logger.info("%s search_chunks_by_text (正则匹配 + 域名过滤)", PASS)
+    return True
+
+
+@pytest.mark.unit
+def test_search_vectors_recall() -> bool:
+    """测试建立 IVF-PQ 索引后 search_vectors 的召回率不低于暴力检索的 90%"""
+    rng = random.Random(7)
+    centers = [[rng.gauss(0, 1) for _ in range(1024)] for _ in range(20)]
+
+    def _vector() -> list[float]:
+        center = rng.choice(centers)
+        vector = [x + rng.gauss(0, 0.6) for x in center]
+        norm = math.hypot(*vector)
+        return [x / norm for x in vector]
+
+    vectors = [_vector() for _ in range(2000)]
+    idx = IndexManager(IN_MEMORY_DB)
+    idx.add_code_chunks([
+        {
+            "vector": vector,
+            "text": f"chunk_{i}",
+            "original_file": "bundle.js",
+            "url": "https://test.com/bundle.js",
+            "domain": "test.com",
+            "line_start": i,
+            "line_end": i,
+            "source_map_restored": False,
+            "file_hash": "abc",
+        }
+        for i, vector in enumerate(vectors)
+    ])
+    assert idx.ensure_vector_index(min_rows=len(vectors)), "向量索引应建立成功"
+
+    recall = 0.0
+    queries = 10
+    for _ in range(queries):
+        query = _vector()
+        scores = [sum(map(operator.mul, query, vector)) for vector in vectors]
+        expected = set(heapq.nlargest(10, range(len(vectors)), key=scores.__getitem__))
+        found = {r["line_start"] for r in idx.search_vectors(query, limit=10)}
+        recall += len(expected & found) / 10
+    recall /= queries
+    assert recall >= 0.9, f"索引检索召回率过低: {recall:.2f}"
+
+    logger.info("%s search_vectors (IVF-PQ 召回率 %.2f)", PASS, recall)
+    return True
 
 
 @pytest.mark.unit
 def test_read_js_file() -> bool:
     """测试读取 JS 文件（行范围）"""
-    tmp_file = Path(tempfile.mktemp(suffix=".js"))
+    lines = [f"// line {i+1}" for i in range(100)]
+    lines[49] = "function encrypt(data) { return btoa(data); }"
+    with tempfile.NamedTemporaryFile(
+        "w", suffix=".js", delete=False, encoding="utf-8"
+    ) as tmp:
+        tmp.write("\n".join(lines))
+    tmp_file = Path(tmp.name)
     try:
-        lines = [f"// line {i+1}" for i in range(100)]
-        lines[49] = "function encrypt(data) { return btoa(data); }"
-        tmp_file.write_text("\n".join(lines), encoding="utf-8")
-
-        content = tmp_file.read_text(encoding="utf-8")
-        all_lines = content.split("\n")
-        assert len(all_lines) == 100
-
-        selected = all_lines[44:54]
+        with open(tmp_file, encoding="utf-8") as f:
+            selected = [line.rstrip("\n") for line in islice(f, 44, 54)]
         assert len(selected) == 10
         assert "encrypt" in selected[5]
 
+        from auto_js_reverse.main import _read_line_range
+
+        streamed, total = _read_line_range(tmp_file, 45, 54)
+        assert total == 100
+        assert streamed == selected
+
+        tmp_file.write_text("a\nb\n", encoding="utf-8")
+        streamed, total = _read_line_range(tmp_file, 2, None)
+        assert total == len("a\nb\n".split("\n"))
+        assert streamed == ["b", ""]
+
         logger.info("%s read_js_file (行范围读取)", PASS)
         return True
     finally:
         tmp_file.unlink(missing_ok=True)
 
 
+def _use_eager_tasks() -> None:
+    # Python 3.12+：新建的任务先同步执行到首次挂起，能立即完成的协程不再经事件循环排队。
+    factory = getattr(asyncio, "eager_task_factory", None)
+    if factory is not None:
+        asyncio.get_running_loop().set_task_factory(factory)
+
+
+# 三个浏览器用例共用一个事件循环与一个已连接并导航到 TARGET_URL 的 BrowserConnector，
+# Chrome 连接与页面导航只做一次；统一在 close_shared_browser() 中断开。
+_browser_loop: Optional[asyncio.AbstractEventLoop] = None
+_browser: Optional[BrowserConnector] = None
+
+
+def _run_in_browser_loop(coro: Coroutine[Any, Any, None]) -> None:
+    global _browser_loop
+    if _browser_loop is None:
+        _browser_loop = asyncio.new_event_loop()
+    _browser_loop.run_until_complete(coro)
+
+
+async def get_browser() -> BrowserConnector:
+    global _browser
+    if _browser is None:
+        config = ensure_test_config(load_config())
+        browser = BrowserConnector(
+            host=config["chrome_cdp"].get("host", "localhost"),
+            port=config["chrome_cdp"].get("port", 9222),
+            auto_launch=True,
+            headless=config["chrome_cdp"].get("headless", True),
+        )
+        await browser.ensure_connected(target_url=TARGET_URL)
+        _browser = browser
+    return _browser
+
+
+def close_shared_browser() -> None:
+    global _browser, _browser_loop
+    loop, _browser_loop = _browser_loop, None
+    browser, _browser = _browser, None
+    if loop is None:
+        return
+    try:
+        if browser is not None:
+            loop.run_until_complete(browser.disconnect())
+    finally:
+        loop.close()
+
+
+@pytest.fixture(scope="module", autouse=True)
+def _shared_browser_teardown():
+    yield
+    close_shared_browser()
+
+
 @pytest.mark.integration
 def test_execute_js() -> bool:
     """测试在浏览器中执行 JS 表达式"""
-    config = ensure_test_config(load_config())
-    config["chrome_cdp"]["auto_launch"] = True
-    config["chrome_cdp"]["headless"] = True
-
-    browser = BrowserConnector(
-        host=config["chrome_cdp"].get("host", "localhost"),
-        port=config["chrome_cdp"].get("port", 9222),
-        auto_launch=config["chrome_cdp"].get("auto_launch", True),
-        headless=config["chrome_cdp"].get("headless", False),
-    )
-
     async def _test():
-        await browser.ensure_connected(target_url=TARGET_URL)
+        _use_eager_tasks()
+        browser = await get_browser()
 
         result = await browser.evaluate("1 + 1")
         assert result == 2, f"1+1 应等于 2, 实际: {result}"
@@ -209,7 +350,7 @@ def test_execute_js() -> bool:
         json_result = await browser.evaluate(
             "JSON.stringify({a: 1, b: 'hello'})"
         )
-        parsed = json.loads(json_result)
+        parsed = _json_loads(json_result)
         assert parsed["a"] == 1 and parsed["b"] == "hello"
 
         try:
@@ -218,9 +359,7 @@ def test_execute_js() -> bool:
         except RuntimeError as e:
             assert "JS 执行异常" in str(e)
 
-        await browser.disconnect()
-
-    asyncio.run(_test())
+    _run_in_browser_loop(_test())
     logger.info("%s execute_js (算术/DOM/cookie/JSON/异常处理)", PASS)
     return True
 
@@ -228,22 +367,16 @@ def test_execute_js() -> bool:
 @pytest.mark.integration
 def test_capture_network() -> bool:
     """测试网络请求捕获"""
-    config = ensure_test_config(load_config())
-    browser = BrowserConnector(
-        host=config["chrome_cdp"].get("host", "localhost"),
-        port=config["chrome_cdp"].get("port", 9222),
-        auto_launch=True,
-        headless=config["chrome_cdp"].get("headless", False),
-    )
-
     async def _test():
-        await browser.ensure_connected(target_url=TARGET_URL)
+        _use_eager_tasks()
+        browser = await get_browser()
 
         await browser.evaluate(
             "setTimeout(function() { fetch('/sugrec?prod=pc_his&from=pc_web&json=1'); }, 500)"
         )
 
-        events = await browser.collect_network_events(duration_sec=3.0)
+        # 捕获到第一个请求即返回，只有页面一直没有网络活动时才等满 3 秒。
+        events = await browser.collect_network_events(duration_sec=3.0, min_count=1)
 
         assert isinstance(events, list), f"应返回列表: {type(events)}"
 
@@ -256,560 +389,540 @@ def test_capture_network() -> bool:
         else:
             logger.info("  未捕获到请求（页面可能无活跃网络活动，属正常）")
 
-        await browser.disconnect()
-
-    asyncio.run(_test())
+    _run_in_browser_loop(_test())
     logger.info("%s capture_network_requests (Network 域监听)", PASS)
     return True
 
 
 @pytest.mark.integration
 def test_hook_function() -> bool:
-    """测试 Hook 函数"""
-    config = ensure_test_config(load_config())
-    browser = BrowserConnector(
-        host=config["chrome_cdp"].get("host", "localhost"),
-        port=config["chrome_cdp"].get("port", 9222),
-        auto_launch=True,
-        headless=config["chrome_cdp"].get("headless", False),
-    )
+    """测试 Hook 函数：经 _run_hook_capture 注入，调用记录通过 CDP binding 上报"""
+    import auto_js_reverse.main as main_mod
 
-    async def _test():
-        await browser.ensure_connected(target_url=TARGET_URL)
+    class PipelineStub:
+        def __init__(self, browser: BrowserConnector):
+            self._browser = browser
 
-        setup = await browser.evaluate("""
-        (function() {
-            window.__testFunc = function(a, b) { return a + b; };
-            return 'ok';
-        })()
-        """)
-        assert setup == "ok"
-
-        hook_js = """
-        (function() {
-            var _hookedCalls = [];
-            var _original = window.__testFunc;
-            if (typeof _original !== 'function') {
-                return JSON.stringify({error: '__testFunc not found'});
-            }
-            window.__testFunc = function() {
-                var args = Array.prototype.slice.call(arguments);
-                var callInfo = {
-                    args: args.map(function(a) { return JSON.stringify(a); }),
-                };
-                var result = _original.apply(this, arguments);
-                callInfo.returnValue = JSON.stringify(result);
-                _hookedCalls.push(callInfo);
-                return result;
-            };
-            window.__browserInsightHook = {
-                calls: _hookedCalls,
-                restore: function() { window.__testFunc = _original; },
-            };
-            return JSON.stringify({status: 'hooked'});
-        })()
-        """
-        hook_result = await browser.evaluate(hook_js)
-        parsed = json.loads(hook_result)
-        assert parsed.get("status") == "hooked", f"Hook 应成功: {parsed}"
-
-        await browser.evaluate("window.__testFunc(1, 2)")
-        await browser.evaluate("window.__testFunc('hello', ' world')")
-
-        calls_raw = await browser.evaluate(
-            "JSON.stringify(window.__browserInsightHook.calls)"
-        )
-        calls = json.loads(calls_raw)
-        assert len(calls) == 2, f"应记录 2 次调用, 实际: {len(calls)}"
-        assert calls[0]["returnValue"] == "3"
-        assert calls[1]["returnValue"] == '"hello world"'
+    async def _test():
+        _use_eager_tasks()
+        browser = await get_browser()
+        await browser.evaluate("window.__testFunc = function(a, b) { return a + b; }; true")
 
-        await browser.evaluate("window.__browserInsightHook.restore()")
+        binding_names: list[str] = []
+        new_binding_name = main_mod._new_hook_binding_name
 
-        result = await browser.evaluate("window.__testFunc(10, 20)")
-        assert result == 30, "恢复后函数应正常工作"
+        def _record_binding_name() -> str:
+            binding_names.append(new_binding_name())
+            return binding_names[-1]
 
-        await browser.disconnect()
+        original_pipeline = main_mod.pipeline
+        main_mod.pipeline = PipelineStub(browser)
+        main_mod._new_hook_binding_name = _record_binding_name
+        try:
+            result = await main_mod._run_hook_capture(
+                function_path="window.__testFunc",
+                target_url=None,
+                trigger_action="window.__testFunc(1, 2), window.__testFunc('hello', ' world')",
+                max_calls=5,
+                duration=0.5,
+            )
+        finally:
+            main_mod.pipeline = original_pipeline
+            main_mod._new_hook_binding_name = new_binding_name
+
+        assert result["status"] == "ok", f"Hook 应成功: {result}"
+        calls = result["calls"]
+        assert len(calls) == 2, f"应通过 binding 收到 2 次调用, 实际: {len(calls)}"
+        assert calls[0]["args"] == ["1", "2"]
+        assert [c["returnValue"] for c in calls] == ["3", '"hello world"']
+
+        assert len(binding_names) == 1
+        assert binding_names[0] not in browser._binding_handlers, "Hook 结束后应移除 binding"
+        state = await browser.evaluate(
+            "({result: window.__testFunc(10, 20),"
+            " hooks: Object.keys(window.__browserInsightHook || {}).length})"
+        )
+        assert state["result"] == 30, "恢复后函数应正常工作"
+        assert state["hooks"] == 0, "恢复后应清除页面内的 Hook 注册项"
 
-    asyncio.run(_test())
-    logger.info("%s hook_function (注入/记录/恢复)", PASS)
+    _run_in_browser_loop(_test())
+    logger.info("%s hook_function (注入/binding 上报/恢复)", PASS)
     return True
 
 
 @pytest.mark.unit
 def test_analyze_encryption() -> bool:
     """测试加密模式扫描"""
-    tmp_db = tempfile.mkdtemp(prefix="mcp_test_encrypt_")
-    try:
-        idx = IndexManager(tmp_db)
-        fake_vector = [0.1] * 1024
-
-        idx.add_code_chunks([
-            {
-                "vector": fake_vector,
-                "text": "var sign = CryptoJS.MD5(params + secret).toString();",
-                "original_file": "sign.js",
-                "url": "https://test.com/sign.js",
-                "domain": "test.com",
-                "line_start": 1,
-                "line_end": 1,
-                "source_map_restored": False,
-                "file_hash": "a1",
-            },
-            {
-                "vector": fake_vector,
-                "text": "var encrypted = CryptoJS.AES.encrypt(data, key);",
-                "original_file": "crypto.js",
-                "url": "https://test.com/crypto.js",
-                "domain": "test.com",
-                "line_start": 5,
-                "line_end": 5,
-                "source_map_restored": False,
-                "file_hash": "a2",
-            },
-            {
-                "vector": fake_vector,
-                "text": "var token = btoa(username + ':' + password);",
-                "original_file": "auth.js",
-                "url": "https://test.com/auth.js",
-                "domain": "test.com",
-                "line_start": 10,
-                "line_end": 10,
-                "source_map_restored": False,
-                "file_hash": "a3",
-            },
-            {
-                "vector": fake_vector,
-                "text": "function getSign(params) { return hmac(params, secretKey); }",
-                "original_file": "api.js",
-                "url": "https://test.com/api.js",
-                "domain": "test.com",
-                "line_start": 20,
-                "line_end": 20,
-                "source_map_restored": False,
-                "file_hash": "a4",
-            },
-            {
-                "vector": fake_vector,
-                "text": "function render() { return div.innerHTML; }",
-                "original_file": "ui.js",
-                "url": "https://test.com/ui.js",
-                "domain": "test.com",
-                "line_start": 1,
-                "line_end": 1,
-                "source_map_restored": False,
-                "file_hash": "a5",
-            },
-        ])
-
-        import re
-        ENCRYPTION_PATTERNS = {
-            "MD5": r"(?i)\b(md5|MD5|hex_md5)\s*\(",
-            "AES": r"(?i)\b(AES|aes)\s*\.\s*(encrypt|decrypt|Encrypt|Decrypt)",
-            "Base64": r"(?i)\b(btoa|atob|Base64|base64)\s*\(",
-            "CryptoJS": r"CryptoJS\.\w+",
-            "sign/signature": r"(?i)\b(sign|signature|getSign|makeSign|calcSign)\s*\(",
-        }
+    idx = IndexManager(IN_MEMORY_DB)
+
+    idx.add_code_chunks([
+        {
+            "vector": FAKE_VECTOR,
+            "text": "var sign = CryptoJS.MD5(params + secret).toString();",
+            "original_file": "sign.js",
+            "url": "https://test.com/sign.js",
+            "domain": "test.com",
+            "line_start": 1,
+            "line_end": 1,
+            "source_map_restored": False,
+            "file_hash": "a1",
+        },
+        {
+            "vector": FAKE_VECTOR,
+            "text": "var encrypted = CryptoJS.AES.encrypt(data, key);",
+            "original_file": "crypto.js",
+            "url": "https://test.com/crypto.js",
+            "domain": "test.com",
+            "line_start": 5,
+            "line_end": 5,
+            "source_map_restored": False,
+            "file_hash": "a2",
+        },
+        {
+            "vector": FAKE_VECTOR,
+            "text": "var token = btoa(username + ':' + password);",
+            "original_file": "auth.js",
+            "url": "https://test.com/auth.js",
+            "domain": "test.com",
+            "line_start": 10,
+            "line_end": 10,
+            "source_map_restored": False,
+            "file_hash": "a3",
+        },
+        {
+            "vector": FAKE_VECTOR,
+            "text": "function getSign(params) { return hmac(params, secretKey); }",
+            "original_file": "api.js",
+            "url": "https://test.com/api.js",
+            "domain": "test.com",
+            "line_start": 20,
+            "line_end": 20,
+            "source_map_restored": False,
+            "file_hash": "a4",
+        },
+        {
+            "vector": FAKE_VECTOR,
+            "text": "function render() { return div.innerHTML; }",
+            "original_file": "ui.js",
+            "url": "https://test.com/ui.js",
+            "domain": "test.com",
+            "line_start": 1,
+            "line_end": 1,
+            "source_map_restored": False,
+            "file_hash": "a5",
+        },
+    ])
 
-        all_matches = {}
-        for name, pattern in ENCRYPTION_PATTERNS.items():
-            matches = idx.search_chunks_by_text(pattern, domain="test.com", limit=20)
-            if matches:
-                filtered = [m for m in matches if re.findall(pattern, m.get("text", ""))]
-                if filtered:
-                    all_matches[name] = filtered
-
-        assert len(all_matches) >= 3, f"应至少检测到 3 种模式, 实际: {list(all_matches.keys())}"
-        assert "CryptoJS" in all_matches, "应检测到 CryptoJS"
-        assert "Base64" in all_matches, "应检测到 Base64"
-        assert "sign/signature" in all_matches, "应检测到 sign/signature"
-
-        ui_matched = idx.search_chunks_by_text(r"CryptoJS", domain="test.com")
-        for m in ui_matched:
-            assert "render" not in m["text"], "不应匹配无关代码"
-
-        logger.info(
-            "%s analyze_encryption (检测到 %d 种模式: %s)",
-            PASS, len(all_matches), ", ".join(all_matches.keys())
-        )
-        return True
+    class PipelineStub:
+        def __init__(self, index: IndexManager):
+            self.index = index
+
+    import auto_js_reverse.main as main_mod
+
+    original_pipeline = main_mod.pipeline
+    main_mod.pipeline = PipelineStub(idx)
+    try:
+        # 同一代码块可同时计入多种模式（如 CryptoJS.MD5( 同属 CryptoJS 与 MD5）。
+        all_matches = main_mod._scan_encryption_matches("test.com")
+        result = asyncio.run(main_mod.analyze_encryption.fn(domain_filter="test.com"))
     finally:
-        shutil.rmtree(tmp_db, ignore_errors=True)
+        main_mod.pipeline = original_pipeline
+
+    assert len(all_matches) >= 3, f"应至少检测到 3 种模式, 实际: {list(all_matches.keys())}"
+    assert "CryptoJS" in all_matches, "应检测到 CryptoJS"
+    assert "Base64" in all_matches, "应检测到 Base64"
+    assert "sign/signature" in all_matches, "应检测到 sign/signature"
+    assert [m["original_file"] for m in all_matches["MD5"]] == ["sign.js"]
+    assert all(
+        m["original_file"] != "ui.js" for matches in all_matches.values() for m in matches
+    ), "不应匹配无关代码"
+
+    ui_matched = idx.search_chunks_by_text(r"CryptoJS", domain="test.com")
+    for m in ui_matched:
+        assert "render" not in m["text"], "不应匹配无关代码"
+
+    assert "加密模式分析结果" in result
+    assert "## MD5 (1 处)" in result, "CryptoJS.MD5( 应同时计入 MD5 与 CryptoJS"
+    assert "## CryptoJS (2 处)" in result
+    assert "## HMAC (1 处)" in result
+    assert "ui.js" not in result, "不应匹配无关代码"
+
+    logger.info(
+        "%s analyze_encryption (检测到 %d 种模式: %s)",
+        PASS, len(all_matches), ", ".join(all_matches.keys())
+    )
+    return True
 
 
 @pytest.mark.unit
 def test_analyze_reverse_targets() -> bool:
     """测试逆向专题分析模板"""
-    tmp_db = tempfile.mkdtemp(prefix="mcp_test_reverse_targets_")
-    try:
-        idx = IndexManager(tmp_db)
-        fake_vector = [0.1] * 1024
-
-        idx.add_code_chunks([
-            {
-                "vector": fake_vector,
-                "text": "window.getSign = function(params, ts, nonce) { return md5(params + ts + nonce + secret); };",
-                "original_file": "sign.js",
-                "url": "https://test.com/sign.js",
-                "domain": "test.com",
-                "line_start": 1,
-                "line_end": 1,
-                "source_map_restored": True,
-                "file_hash": "b1",
-            },
-            {
-                "vector": fake_vector,
-                "text": "function buildHeaders(token, ts, nonce) { return { 'x-sign': getSign(ts + nonce), 'x-token': token, 'x-timestamp': ts, 'x-nonce': nonce }; }",
-                "original_file": "request.js",
-                "url": "https://test.com/request.js",
-                "domain": "test.com",
-                "line_start": 10,
-                "line_end": 12,
-                "source_map_restored": True,
-                "file_hash": "b2",
-            },
-            {
-                "vector": fake_vector,
-                "text": "const injectToken = (config) => { config.headers.Authorization = 'Bearer ' + localStorage.getItem('token'); return config; };",
-                "original_file": "auth.js",
-                "url": "https://test.com/auth.js",
-                "domain": "test.com",
-                "line_start": 20,
-                "line_end": 20,
-                "source_map_restored": False,
-                "file_hash": "b3",
-            },
-            {
-                "vector": fake_vector,
-                "text": "window.encryptPassword = function(password) { return CryptoJS.AES.encrypt(password, key).toString(); };",
-                "original_file": "crypto.js",
-                "url": "https://test.com/crypto.js",
-                "domain": "test.com",
-                "line_start": 30,
-                "line_end": 30,
-                "source_map_restored": False,
-                "file_hash": "b4",
-            },
-        ])
-
-        class PipelineStub:
-            def __init__(self, index: IndexManager):
-                self.index = index
+    idx = IndexManager(IN_MEMORY_DB)
+
+    idx.add_code_chunks([
+        {
+            "vector": FAKE_VECTOR,
+            "text": "window.getSign = function(params, ts, nonce) { return md5(params + ts + nonce + secret); };",
+            "original_file": "sign.js",
+            "url": "https://test.com/sign.js",
+            "domain": "test.com",
+            "line_start": 1,
+            "line_end": 1,
+            "source_map_restored": True,
+            "file_hash": "b1",
+        },
+        {
+            "vector": FAKE_VECTOR,
+            "text": "function buildHeaders(token, ts, nonce) { return { 'x-sign': getSign(ts + nonce), 'x-token': token, 'x-timestamp': ts, 'x-nonce': nonce }; }",
+            "original_file": "request.js",
+            "url": "https://test.com/request.js",
+            "domain": "test.com",
+            "line_start": 10,
+            "line_end": 12,
+            "source_map_restored": True,
+            "file_hash": "b2",
+        },
+        {
+            "vector": FAKE_VECTOR,
+            "text": "const injectToken = (config) => { config.headers.Authorization = 'Bearer ' + localStorage.getItem('token'); return config; };",
+            "original_file": "auth.js",
+            "url": "https://test.com/auth.js",
+            "domain": "test.com",
+            "line_start": 20,
+            "line_end": 20,
+            "source_map_restored": False,
+            "file_hash": "b3",
+        },
+        {
+            "vector": FAKE_VECTOR,
+            "text": "window.encryptPassword = function(password) { return CryptoJS.AES.encrypt(password, key).toString(); };",
+            "original_file": "crypto.js",
+            "url": "https://test.com/crypto.js",
+            "domain": "test.com",
+            "line_start": 30,
+            "line_end": 30,
+            "source_map_restored": False,
+            "file_hash": "b4",
+        },
+    ])
 
-        import auto_js_reverse.main as main_mod
+    class PipelineStub:
+        def __init__(self, index: IndexManager):
+            self.index = index
 
-        original_pipeline = main_mod.pipeline
-        main_mod.pipeline = PipelineStub(idx)
-        try:
-            result = asyncio.run(
-                main_mod.analyze_reverse_targets.fn(domain_filter="test.com")
-            )
-        finally:
-            main_mod.pipeline = original_pipeline
+    import auto_js_reverse.main as main_mod
 
-        assert "逆向专题分析" in result
-        assert "## sign" in result
-        assert "## token" in result
-        assert "## encrypt" in result
-        assert "## headers" in result
-        assert "`window.getSign`" in result
-        assert "`window.encryptPassword`" in result
-        assert "`x-sign`" in result
-        assert "`authorization`" in result.lower()
-
-        logger.info("%s analyze_reverse_targets (专题聚类 + hook 候选 + headers)", PASS)
-        return True
+    original_pipeline = main_mod.pipeline
+    main_mod.pipeline = PipelineStub(idx)
+    try:
+        result = asyncio.run(
+            main_mod.analyze_reverse_targets.fn(domain_filter="test.com")
+        )
     finally:
-        shutil.rmtree(tmp_db, ignore_errors=True)
+        main_mod.pipeline = original_pipeline
+
+    assert "逆向专题分析" in result
+    assert "## sign" in result
+    assert "## token" in result
+    assert "## encrypt" in result
+    assert "## headers" in result
+    assert "`window.getSign`" in result
+    assert "`window.encryptPassword`" in result
+    assert "`x-sign`" in result
+    assert "`authorization`" in result.lower()
+
+    logger.info("%s analyze_reverse_targets (专题聚类 + hook 候选 + headers)", PASS)
+    return True
 
 
 @pytest.mark.unit
 def test_auto_probe_hook_candidates() -> bool:
     """测试自动候选 Hook 试探"""
-    tmp_db = tempfile.mkdtemp(prefix="mcp_test_auto_probe_")
-    try:
-        idx = IndexManager(tmp_db)
-        fake_vector = [0.1] * 1024
-        idx.add_code_chunks([
-            {
-                "vector": fake_vector,
-                "text": "window.getSign = function(params, ts, nonce) { return md5(params + ts + nonce + secret); };",
-                "original_file": "sign.js",
-                "url": "https://test.com/sign.js",
-                "domain": "test.com",
-                "line_start": 1,
-                "line_end": 1,
-                "source_map_restored": True,
-                "file_hash": "c1",
-            }
-        ])
-
-        class BrowserStub:
-            def __init__(self):
-                self.current_target = ""
-
-            async def ensure_connected(self, target_url: str = None) -> None:
-                return None
-
-            async def evaluate(self, expression: str):
-                if "window.getSign" in expression and "__browserInsightHook" in expression:
-                    self.current_target = "window.getSign"
-                    return json.dumps({"status": "hooked", "target": "window.getSign"})
-                if expression == "window.login()":
-                    return None
-                if "JSON.stringify(window.__browserInsightHook" in expression:
-                    return json.dumps(
-                        [
-                            {
-                                "args": ['"abc"', '"123"', '"nonce"'],
-                                "returnValue": '"sig123"',
-                                "stack": ["at window.getSign (<anonymous>:1:1)"],
-                            }
-                        ]
+    idx = IndexManager(IN_MEMORY_DB)
+    idx.add_code_chunks([
+        {
+            "vector": FAKE_VECTOR,
+            "text": "window.getSign = function(params, ts, nonce) { return md5(params + ts + nonce + secret); };",
+            "original_file": "sign.js",
+            "url": "https://test.com/sign.js",
+            "domain": "test.com",
+            "line_start": 1,
+            "line_end": 1,
+            "source_map_restored": True,
+            "file_hash": "c1",
+        }
+    ])
+
+    class BrowserStub:
+        def __init__(self):
+            self.current_target = ""
+            self.bindings = {}
+
+        async def ensure_connected(self, target_url: str = None) -> None:
+            return None
+
+        async def add_binding(self, name, handler) -> None:
+            self.bindings[name] = handler
+
+        async def remove_binding(self, name) -> None:
+            self.bindings.pop(name, None)
+
+        async def evaluate(self, expression: str):
+            if "window.getSign" in expression and "__browserInsightHook" in expression:
+                assert len(self.bindings) == 1
+                assert next(iter(self.bindings)) in expression
+                self.current_target = "window.getSign"
+                return json.dumps({"status": "hooked", "target": "window.getSign"})
+            if expression == "window.login()":
+                report = next(iter(self.bindings.values()))
+                report(
+                    json.dumps(
+                        {
+                            "args": ['"abc"', "123", '{"nonce":"n1"}'],
+                            "returnValue": '"sig123"',
+                            "stack": ["at window.getSign (<anonymous>:1:1)"],
+                        }
                     )
-                if "window.__browserInsightHook && window.__browserInsightHook.restore()" in expression:
-                    return None
-                raise AssertionError(f"收到未预期的表达式: {expression}")
+                )
+                return None
+            if "restore()" in expression and next(iter(self.bindings)) in expression:
+                return None
+            raise AssertionError(f"收到未预期的表达式: {expression}")
 
-        class PipelineStub:
-            def __init__(self, index: IndexManager):
-                self.index = index
-                self._browser = BrowserStub()
+    class PipelineStub:
+        def __init__(self, index: IndexManager):
+            self.index = index
+            self._browser = BrowserStub()
 
-        import auto_js_reverse.main as main_mod
+    import auto_js_reverse.main as main_mod
 
-        original_pipeline = main_mod.pipeline
-        main_mod.pipeline = PipelineStub(idx)
-        try:
-            result = asyncio.run(
-                main_mod.auto_probe_hook_candidates.fn(
-                    domain_filter="test.com",
-                    focus="sign",
-                    trigger_action="window.login()",
-                    max_candidates=2,
-                    max_calls=3,
-                    duration=0.0,
-                    stop_on_first_hit=True,
-                )
+    original_pipeline = main_mod.pipeline
+    pipeline_stub = PipelineStub(idx)
+    main_mod.pipeline = pipeline_stub
+    try:
+        result = asyncio.run(
+            main_mod.auto_probe_hook_candidates.fn(
+                domain_filter="test.com",
+                focus="sign",
+                trigger_action="window.login()",
+                max_candidates=2,
+                max_calls=3,
+                duration=0.0,
+                stop_on_first_hit=True,
             )
-        finally:
-            main_mod.pipeline = original_pipeline
+        )
+    finally:
+        main_mod.pipeline = original_pipeline
 
-        assert "候选 Hook 试探" in result
-        assert "`window.getSign`" in result
-        assert "✅ 命中 1 次调用" in result
-        assert "sig123" in result
-        assert "已命中候选入口" in result
+    assert "候选 Hook 试探" in result
+    assert "`window.getSign`" in result
+    assert "✅ 命中 1 次调用" in result
+    assert "sig123" in result
+    assert '"abc", 123, {"nonce":"n1"}' in result
+    assert "已命中候选入口" in result
+    assert pipeline_stub._browser.bindings == {}, "Hook 结束后应移除 binding"
 
-        logger.info("%s auto_probe_hook_candidates (自动候选 Hook 试探)", PASS)
-        return True
-    finally:
-        shutil.rmtree(tmp_db, ignore_errors=True)
+    logger.info("%s auto_probe_hook_candidates (自动候选 Hook 试探)", PASS)
+    return True
 
 
 @pytest.mark.unit
 def test_correlate_request_flow() -> bool:
     """测试请求流与代码线索自动对齐"""
-    tmp_db = tempfile.mkdtemp(prefix="mcp_test_request_flow_")
-    try:
-        idx = IndexManager(tmp_db)
-        fake_vector = [0.1] * 1024
-        idx.add_code_chunks([
-            {
-                "vector": fake_vector,
-                "text": "window.getSign = function(body, ts, nonce) { return md5(body + ts + nonce + secret); };",
-                "original_file": "sign.js",
-                "url": "https://test.com/sign.js",
-                "domain": "test.com",
-                "line_start": 1,
-                "line_end": 1,
-                "source_map_restored": True,
-                "file_hash": "d1",
-            },
-            {
-                "vector": fake_vector,
-                "text": "function attachHeaders(cfg) { cfg.headers['x-sign'] = window.getSign(cfg.data, cfg.headers['x-timestamp'], cfg.headers['x-nonce']); cfg.headers.Authorization = 'Bearer ' + token; return cfg; }",
-                "original_file": "request.js",
-                "url": "https://test.com/request.js",
-                "domain": "test.com",
-                "line_start": 10,
-                "line_end": 12,
-                "source_map_restored": True,
-                "file_hash": "d2",
-            },
-        ])
-
-        class BrowserStub:
-            async def ensure_connected(self, target_url: str = None) -> None:
-                return None
-
-            async def evaluate(self, expression: str):
-                if expression == "window.login()":
-                    return None
-                if expression == "location.reload()":
-                    return None
-                raise AssertionError(f"收到未预期的表达式: {expression}")
-
-            async def collect_network_events(self, duration_sec: float) -> list[dict]:
-                return [
-                    {
-                        "url": "https://api.test.com/login",
-                        "method": "POST",
-                        "headers": {
-                            "x-sign": "abc123",
-                            "x-timestamp": "1700000000",
-                            "x-nonce": "nonce-1",
-                            "Authorization": "Bearer token-1",
-                            "content-type": "application/json",
-                        },
-                        "postData": '{"username":"alice","password":"secret"}',
-                        "type": "XHR",
-                        "initiator": "script",
-                        "response": {"status": 200},
-                    },
-                    {
-                        "url": "https://api.test.com/profile",
-                        "method": "GET",
-                        "headers": {"content-type": "application/json"},
-                        "postData": "",
-                        "type": "XHR",
-                        "initiator": "script",
-                        "response": {"status": 200},
-                    },
-                ]
-
-        class PipelineStub:
-            def __init__(self, index: IndexManager):
-                self.index = index
-                self._browser = BrowserStub()
+    idx = IndexManager(IN_MEMORY_DB)
+    idx.add_code_chunks([
+        {
+            "vector": FAKE_VECTOR,
+            "text": "window.getSign = function(body, ts, nonce) { return md5(body + ts + nonce + secret); };",
+            "original_file": "sign.js",
+            "url": "https://test.com/sign.js",
+            "domain": "test.com",
+            "line_start": 1,
+            "line_end": 1,
+            "source_map_restored": True,
+            "file_hash": "d1",
+        },
+        {
+            "vector": FAKE_VECTOR,
+            "text": "function attachHeaders(cfg) { cfg.headers['x-sign'] = window.getSign(cfg.data, cfg.headers['x-timestamp'], cfg.headers['x-nonce']); cfg.headers.Authorization = 'Bearer ' + token; return cfg; }",
+            "original_file": "request.js",
+            "url": "https://test.com/request.js",
+            "domain": "test.com",
+            "line_start": 10,
+            "line_end": 12,
+            "source_map_restored": True,
+            "file_hash": "d2",
+        },
+    ])
 
-        import auto_js_reverse.main as main_mod
+    class BrowserStub:
+        async def ensure_connected(self, target_url: str = None) -> None:
+            return None
 
-        original_pipeline = main_mod.pipeline
-        main_mod.pipeline = PipelineStub(idx)
-        try:
-            result = asyncio.run(
-                main_mod.correlate_request_flow.fn(
-                    domain_filter="test.com",
-                    focus="sign",
-                    trigger_action="window.login()",
-                    duration=0.1,
-                    max_requests=2,
-                    max_candidates=3,
-                )
+        async def evaluate(self, expression: str):
+            if expression == "window.login()":
+                return None
+            if expression == "location.reload()":
+                return None
+            raise AssertionError(f"收到未预期的表达式: {expression}")
+
+        async def collect_network_events(self, duration_sec: float) -> list[dict]:
+            return [
+                {
+                    "url": "https://api.test.com/login",
+                    "method": "POST",
+                    "headers": {
+                        "x-sign": "abc123",
+                        "x-timestamp": "1700000000",
+                        "x-nonce": "nonce-1",
+                        "Authorization": "Bearer token-1",
+                        "content-type": "application/json",
+                    },
+                    "postData": '{"username":"alice","password":"secret"}',
+                    "type": "XHR",
+                    "initiator": "script",
+                    "response": {"status": 200},
+                },
+                {
+                    "url": "https://api.test.com/profile",
+                    "method": "GET",
+                    "headers": {"content-type": "application/json"},
+                    "postData": "",
+                    "type": "XHR",
+                    "initiator": "script",
+                    "response": {"status": 200},
+                },
+            ]
+
+    class PipelineStub:
+        def __init__(self, index: IndexManager):
+            self.index = index
+            self._browser = BrowserStub()
+
+    import auto_js_reverse.main as main_mod
+
+    original_pipeline = main_mod.pipeline
+    main_mod.pipeline = PipelineStub(idx)
+    try:
+        result = asyncio.run(
+            main_mod.correlate_request_flow.fn(
+                domain_filter="test.com",
+                focus="sign",
+                trigger_action="window.login()",
+                duration=0.1,
+                max_requests=2,
+                max_candidates=3,
             )
-        finally:
-            main_mod.pipeline = original_pipeline
+        )
+    finally:
+        main_mod.pipeline = original_pipeline
 
-        assert "请求流关联分析" in result
-        assert "https://api.test.com/login" in result
-        assert "`x-sign`" in result
-        assert "`window.getSign`" in result
-        assert "`password`" in result
+    assert "请求流关联分析" in result
+    assert "https://api.test.com/login" in result
+    assert "`x-sign`" in result
+    assert "`window.getSign`" in result
+    assert "`password`" in result
 
-        logger.info("%s correlate_request_flow (请求与代码线索对齐)", PASS)
-        return True
-    finally:
-        shutil.rmtree(tmp_db, ignore_errors=True)
+    logger.info("%s correlate_request_flow (请求与代码线索对齐)", PASS)
+    return True
 
 
 @pytest.mark.unit
 def test_generate_verification_actions() -> bool:
     """测试自动生成验证动作"""
-    tmp_db = tempfile.mkdtemp(prefix="mcp_test_verification_actions_")
-    try:
-        idx = IndexManager(tmp_db)
-        fake_vector = [0.1] * 1024
-        idx.add_code_chunks([
-            {
-                "vector": fake_vector,
-                "text": "window.getSign = function(body, ts, nonce) { return md5(body + ts + nonce + secret); };",
-                "original_file": "sign.js",
-                "url": "https://test.com/sign.js",
-                "domain": "test.com",
-                "line_start": 30,
-                "line_end": 30,
-                "source_map_restored": True,
-                "file_hash": "e1",
-            },
-            {
-                "vector": fake_vector,
-                "text": "function attachHeaders(cfg) { cfg.headers['x-sign'] = window.getSign(cfg.data, cfg.headers['x-timestamp'], cfg.headers['x-nonce']); return cfg; }",
-                "original_file": "request.js",
-                "url": "https://test.com/request.js",
-                "domain": "test.com",
-                "line_start": 50,
-                "line_end": 55,
-                "source_map_restored": True,
-                "file_hash": "e2",
-            },
-        ])
-
-        class BrowserStub:
-            async def ensure_connected(self, target_url: str = None) -> None:
-                return None
-
-            async def evaluate(self, expression: str):
-                if expression == "window.login()":
-                    return None
-                if expression == "location.reload()":
-                    return None
-                raise AssertionError(f"收到未预期的表达式: {expression}")
-
-            async def collect_network_events(self, duration_sec: float) -> list[dict]:
-                return [
-                    {
-                        "url": "https://api.test.com/login",
-                        "method": "POST",
-                        "headers": {
-                            "x-sign": "abc123",
-                            "x-timestamp": "1700000000",
-                            "x-nonce": "nonce-1",
-                        },
-                        "postData": '{"password":"secret"}',
-                        "type": "XHR",
-                        "initiator": "script",
-                        "response": {"status": 200},
-                    }
-                ]
-
-        class PipelineStub:
-            def __init__(self, index: IndexManager):
-                self.index = index
-                self._browser = BrowserStub()
+    idx = IndexManager(IN_MEMORY_DB)
+    idx.add_code_chunks([
+        {
+            "vector": FAKE_VECTOR,
+            "text": "window.getSign = function(body, ts, nonce) { return md5(body + ts + nonce + secret); };",
+            "original_file": "sign.js",
+            "url": "https://test.com/sign.js",
+            "domain": "test.com",
+            "line_start": 30,
+            "line_end": 30,
+            "source_map_restored": True,
+            "file_hash": "e1",
+        },
+        {
+            "vector": FAKE_VECTOR,
+            "text": "function attachHeaders(cfg) { cfg.headers['x-sign'] = window.getSign(cfg.data, cfg.headers['x-timestamp'], cfg.headers['x-nonce']); return cfg; }",
+            "original_file": "request.js",
+            "url": "https://test.com/request.js",
+            "domain": "test.com",
+            "line_start": 50,
+            "line_end": 55,
+            "source_map_restored": True,
+            "file_hash": "e2",
+        },
+    ])
 
-        import auto_js_reverse.main as main_mod
+    class BrowserStub:
+        async def ensure_connected(self, target_url: str = None) -> None:
+            return None
 
-        original_pipeline = main_mod.pipeline
-        main_mod.pipeline = PipelineStub(idx)
-        try:
-            result = asyncio.run(
-                main_mod.generate_verification_actions.fn(
-                    domain_filter="test.com",
-                    focus="sign",
-                    target_url="https://test.com/login",
-                    trigger_action="window.login()",
-                    duration=0.1,
-                    max_requests=2,
-                    max_candidates=2,
-                )
+        async def evaluate(self, expression: str):
+            if expression == "window.login()":
+                return None
+            if expression == "location.reload()":
+                return None
+            raise AssertionError(f"收到未预期的表达式: {expression}")
+
+        async def collect_network_events(self, duration_sec: float) -> list[dict]:
+            return [
+                {
+                    "url": "https://api.test.com/login",
+                    "method": "POST",
+                    "headers": {
+                        "x-sign": "abc123",
+                        "x-timestamp": "1700000000",
+                        "x-nonce": "nonce-1",
+                    },
+                    "postData": '{"password":"secret"}',
+                    "type": "XHR",
+                    "initiator": "script",
+                    "response": {"status": 200},
+                }
+            ]
+
+    class PipelineStub:
+        def __init__(self, index: IndexManager):
+            self.index = index
+            self._browser = BrowserStub()
+
+    import auto_js_reverse.main as main_mod
+
+    original_pipeline = main_mod.pipeline
+    main_mod.pipeline = PipelineStub(idx)
+    try:
+        result = asyncio.run(
+            main_mod.generate_verification_actions.fn(
+                domain_filter="test.com",
+                focus="sign",
+                target_url="https://test.com/login",
+                trigger_action="window.login()",
+                duration=0.1,
+                max_requests=2,
+                max_candidates=2,
             )
-        finally:
-            main_mod.pipeline = original_pipeline
+        )
+    finally:
+        main_mod.pipeline = original_pipeline
 
-        assert "自动验证动作建议" in result
-        assert "read_js_file(url=\"https://test.com/sign.js\"" in result
-        assert "execute_js(expression=\"typeof window.getSign\"" in result
-        assert "hook_function(function_path=\"window.getSign\"" in result
-        assert "capture_network_requests(" in result
+    assert "自动验证动作建议" in result
+    assert "read_js_file(url=\"https://test.com/sign.js\"" in result
+    assert "execute_js(expression=\"typeof window.getSign\"" in result
+    assert "hook_function(function_path=\"window.getSign\"" in result
+    assert "capture_network_requests(" in result
 
-        logger.info("%s generate_verification_actions (自动生成验证动作)", PASS)
-        return True
-    finally:
-        shutil.rmtree(tmp_db, ignore_errors=True)
+    logger.info("%s generate_verification_actions (自动生成验证动作)", PASS)
+    return True
 
 
 def main():
+    from auto_js_reverse.main import _install_uvloop
+
+    _install_uvloop()
+
     logger.info("=" * 60)
     logger.info("auto_js_reverse 新工具测试")
     logger.info("=" * 60)
@@ -822,17 +935,23 @@ def main():
     logger.info("\n--- 2/7 search_chunks_by_text ---")
     results["search_chunks_by_text"] = test_search_chunks_by_text()
 
+    logger.info("\n--- 2b search_vectors 召回率 ---")
+    results["search_vectors_recall"] = test_search_vectors_recall()
+
     logger.info("\n--- 3/7 read_js_file ---")
     results["read_js_file"] = test_read_js_file()
 
-    logger.info("\n--- 4/7 execute_js ---")
-    results["execute_js"] = test_execute_js()
+    try:
+        logger.info("\n--- 4/7 execute_js ---")
+        results["execute_js"] = test_execute_js()
 
-    logger.info("\n--- 5/7 capture_network_requests ---")
-    results["capture_network"] = test_capture_network()
+        logger.info("\n--- 5/7 capture_network_requests ---")
+        results["capture_network"] = test_capture_network()
 
-    logger.info("\n--- 6/7 hook_function ---")
-    results["hook_function"] = test_hook_function()
+        logger.info("\n--- 6/7 hook_function ---")
+        results["hook_function"] = test_hook_function()
+    finally:
+        close_shared_browser()
 
     logger.info("\n--- 7/11 analyze_encryption ---")
     results["analyze_encryption"] = test_analyze_encryption()
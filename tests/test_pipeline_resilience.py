@@ -1,7 +1,6 @@
 from __future__ import annotations
 
 import asyncio
-import shutil
 import sys
 import tempfile
 from datetime import datetime, timezone
@@ -11,6 +10,8 @@ import pytest
 
 sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
 
+from auto_js_reverse.services.embedding_service import EmbeddingService
+from auto_js_reverse.services.index_manager import IndexManager
 from auto_js_reverse.services.pipeline import Pipeline
 
 
@@ -21,6 +22,9 @@ class FakeEmbeddingService:
     async def embed_texts(self, texts: list[str]) -> list[list[float]]:
         return [[0.1] * 1024 for _ in texts]
 
+    async def embed_batch(self, texts: list[str]) -> list[list[float]]:
+        return await self.embed_texts(texts)
+
     async def embed_query(self, query: str) -> list[float]:
         return [0.2] * 1024
 
@@ -54,8 +58,10 @@ class FakeNodeBridge:
 
 
 def test_pipeline_init_without_embedding_key() -> None:
-    tmp_root = Path(tempfile.mkdtemp(prefix="pipeline_init_"))
-    try:
+    with tempfile.TemporaryDirectory(
+        prefix="pipeline_init_", ignore_cleanup_errors=True
+    ) as tmp:
+        tmp_root = Path(tmp)
         config = {
             "storage": {"db_dir": str(tmp_root / "db")},
             "embedding": {},
@@ -64,13 +70,13 @@ def test_pipeline_init_without_embedding_key() -> None:
 
         assert pipeline.get_embedding_unavailable_reason() is not None
         assert pipeline.index.get_file_count() == 0
-    finally:
-        shutil.rmtree(tmp_root, ignore_errors=True)
 
 
 def test_build_session_dir_creates_snapshot_paths() -> None:
-    tmp_root = Path(tempfile.mkdtemp(prefix="pipeline_session_"))
-    try:
+    with tempfile.TemporaryDirectory(
+        prefix="pipeline_session_", ignore_cleanup_errors=True
+    ) as tmp:
+        tmp_root = Path(tmp)
         pipeline = Pipeline(
             config={"storage": {"db_dir": str(tmp_root / "db")}},
             base_dir=tmp_root,
@@ -84,13 +90,13 @@ def test_build_session_dir_creates_snapshot_paths() -> None:
         assert first.parent == second.parent
         assert first.name.startswith("135501-123456")
         assert second.name.startswith("135501-123456")
-    finally:
-        shutil.rmtree(tmp_root, ignore_errors=True)
 
 
 def test_parse_and_index_uses_content_hash() -> None:
-    tmp_root = Path(tempfile.mkdtemp(prefix="pipeline_index_"))
-    try:
+    with tempfile.TemporaryDirectory(
+        prefix="pipeline_index_", ignore_cleanup_errors=True
+    ) as tmp:
+        tmp_root = Path(tmp)
         pipeline = Pipeline(
             config={"storage": {"db_dir": str(tmp_root / "db")}},
             base_dir=tmp_root,
@@ -113,5 +119,152 @@ def test_parse_and_index_uses_content_hash() -> None:
         results = pipeline.index.search_chunks_by_text("importantFeature", domain="example.com")
         assert len(results) == 1
         assert results[0]["file_hash"] == "real-content-hash"
-    finally:
-        shutil.rmtree(tmp_root, ignore_errors=True)
+
+
+def test_search_reuses_semantic_cache() -> None:
+    with tempfile.TemporaryDirectory(
+        prefix="pipeline_search_cache_", ignore_cleanup_errors=True
+    ) as tmp:
+        tmp_root = Path(tmp)
+        pipeline = Pipeline(
+            config={"storage": {"db_dir": str(tmp_root / "db")}},
+            base_dir=tmp_root,
+        )
+        pipeline._embedding = FakeEmbeddingService()
+        pipeline._node_bridge = FakeNodeBridge()
+        files = [
+            {
+                "path": str(tmp_root / "app.js"),
+                "mapPath": "",
+                "url": "https://example.com/app.js",
+                "fileHash": "real-content-hash",
+            }
+        ]
+        asyncio.run(pipeline._parse_and_index(files, "example.com"))
+
+        calls: list[dict] = []
+        original_search_vectors = pipeline.index.search_vectors
+
+        def counting_search_vectors(query_vector, limit=10, domain_filter=None):
+            calls.append({"limit": limit, "domain_filter": domain_filter})
+            return original_search_vectors(
+                query_vector, limit=limit, domain_filter=domain_filter
+            )
+
+        pipeline.index.search_vectors = counting_search_vectors
+
+        first = asyncio.run(pipeline.search("登录签名", domain_filter="example.com"))
+        second = asyncio.run(pipeline.search("签名逻辑", domain_filter="example.com"))
+        assert len(calls) == 1
+        assert [r["text"] for r in first] == [r["text"] for r in second]
+
+        asyncio.run(pipeline.search("签名逻辑", domain_filter="other.com"))
+        assert len(calls) == 2
+
+        asyncio.run(pipeline._parse_and_index(files, "example.com"))
+        asyncio.run(pipeline.search("登录签名", domain_filter="example.com"))
+        assert len(calls) == 3
+
+
+def test_search_repeated_query_skips_embedding() -> None:
+    with tempfile.TemporaryDirectory(
+        prefix="pipeline_search_text_cache_", ignore_cleanup_errors=True
+    ) as tmp:
+        tmp_root = Path(tmp)
+        pipeline = Pipeline(
+            config={"storage": {"db_dir": str(tmp_root / "db")}},
+            base_dir=tmp_root,
+        )
+        embedding = FakeEmbeddingService()
+        queries: list[str] = []
+        original_embed_query = embedding.embed_query
+
+        async def counting_embed_query(query: str) -> list[float]:
+            queries.append(query)
+            return await original_embed_query(query)
+
+        embedding.embed_query = counting_embed_query
+        pipeline._embedding = embedding
+
+        first = asyncio.run(pipeline.search("登录签名", domain_filter="example.com"))
+        second = asyncio.run(pipeline.search("登录签名", domain_filter="example.com"))
+        assert queries == ["登录签名"]
+        assert first == second
+
+        asyncio.run(pipeline.search("登录签名", domain_filter="other.com"))
+        asyncio.run(pipeline.search("签名逻辑", domain_filter="example.com"))
+        assert queries == ["登录签名", "登录签名", "签名逻辑"]
+
+
+def test_embed_batch_skips_cached_texts() -> None:
+    with tempfile.TemporaryDirectory(
+        prefix="embedding_cache_", ignore_cleanup_errors=True
+    ) as tmp:
+        tmp_root = Path(tmp)
+        index = IndexManager(str(tmp_root / "db"))
+        service = EmbeddingService(api_key="test-key", cache=index)
+        requested: list[list[str]] = []
+
+        async def fake_request(texts: list[str]) -> list[list[float]]:
+            requested.append(list(texts))
+            return [[float(len(t))] * 1024 for t in texts]
+
+        service._request_embeddings = fake_request
+
+        first = asyncio.run(service.embed_batch(["aaa", "bb", "aaa"]))
+        assert requested == [["aaa", "bb"]]
+        assert [v[0] for v in first] == [3.0, 2.0, 3.0]
+
+        second = asyncio.run(service.embed_batch(["bb", "cccc"]))
+        assert requested[1:] == [["cccc"]]
+        assert [v[0] for v in second] == [2.0, 4.0]
+
+
+def test_embed_batch_cache_is_scoped_to_model() -> None:
+    with tempfile.TemporaryDirectory(
+        prefix="embedding_cache_model_", ignore_cleanup_errors=True
+    ) as tmp:
+        index = IndexManager(str(Path(tmp) / "db"))
+        requested: list[tuple[str, list[str]]] = []
+
+        def make_service(model_name: str) -> EmbeddingService:
+            service = EmbeddingService(
+                model_name=model_name, api_key="test-key", cache=index
+            )
+
+            async def fake_request(texts: list[str]) -> list[list[float]]:
+                requested.append((model_name, list(texts)))
+                return [[1.0] * 1024 for _ in texts]
+
+            service._request_embeddings = fake_request
+            return service
+
+        asyncio.run(make_service("model-a").embed_batch(["aaa"]))
+        asyncio.run(make_service("model-b").embed_batch(["aaa"]))
+        asyncio.run(make_service("model-a").embed_batch(["aaa"]))
+        assert requested == [("model-a", ["aaa"]), ("model-b", ["aaa"])]
+
+
+def test_embed_texts_keeps_batch_order_under_concurrency() -> None:
+    service = EmbeddingService(api_key="test-key", batch_size=2, max_concurrency=3)
+    in_flight = 0
+    peak = 0
+
+    async def fake_request(texts: list[str]) -> list[list[float]]:
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        # 让靠前的批次更晚返回，验证结果仍按输入顺序拼接。
+        await asyncio.sleep(0.01 * (10 - len(texts[0])))
+        in_flight -= 1
+        if "413" in texts and len(texts) > 1:
+            raise RuntimeError("硅基流动 Embedding API 错误 (HTTP 413): too long")
+        return [[float(len(t))] * 1024 for t in texts]
+
+    service._request_embeddings = fake_request
+
+    texts = ["a" * n for n in range(1, 10)]
+    texts[4] = "413"
+    result = asyncio.run(service.embed_texts(texts))
+    assert [v[0] for v in result] == [float(len(t)) for t in texts]
+    assert 1 < peak <= 3